@@ -24,6 +24,7 @@ Setup (Windows, simplest):
         pip install --upgrade pip
         pip install pillow numpy requests
         pip install realesrgan basicsr
+        pip install pyspng  # optional: faster PNG encode
         # then install torch separately from pytorch.org with CUDA support
   4) Download MangaJaNai model .pth files into ./models/
      (See the-database/MangaJaNai releases for model names.)
@@ -37,12 +38,16 @@ If deps/models are missing, /enhance will return the original image (passthrough
 an X-MU-Host-Error header explaining what's missing.
 """
 from __future__ import annotations
-import hashlib, io, json, os, sys, threading, time, traceback, urllib.parse, re, types, importlib.util, importlib
+import bisect, functools, hashlib, http.cookiejar, io, json, os, shutil, sys, threading, time, traceback, urllib.parse, re, types, importlib.util, importlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from typing import TYPE_CHECKING
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from PIL import Image
 
 if TYPE_CHECKING:
@@ -50,6 +55,9 @@ if TYPE_CHECKING:
 
 PORT = 48159
 HOST = "127.0.0.1"
+# Peers allowed to hit /telemetry and /shutdown (incl. the IPv4-mapped form, should HOST ever
+# become a dual-stack bind).
+_LOCAL_ADDRS = frozenset({"127.0.0.1", "::1", "::ffff:127.0.0.1"})
 
 def _get_root_dir() -> str:
   if getattr(sys, "frozen", False):
@@ -123,13 +131,63 @@ DEFAULT_CFG = {
 
 QUALITY_PROFILES = {
   "fast": {"tile": 0, "tile_pad": 8, "pre_pad": 0, "half": True},
-  # Balanced used to tile very aggressively (slow). Prefer no tiling on CUDA and
-  # only fall back to tiling on OOM.
+  # Balanced used to tile very aggressively (slow). tile=0 means auto: no tiling unless the
+  # page looks too big for free VRAM, and a VRAM-sized tile on OOM.
   "balanced": {"tile": 0, "tile_pad": 10, "pre_pad": 0, "half": True},
   "best": {"tile": 0, "tile_pad": 10, "pre_pad": 0, "half": False}
 }
 
 
+_MODEL_SCAN_PAT = re.compile(r"^(?P<scale>[24])x_(?P<kind>MangaJaNai|IllustrationJaNai)_(?P<h>\d+)p_.*\.pth$", re.IGNORECASE)
+_ILLU_QUALITY_PAT = re.compile(r"^(?P<scale>[24])x_IllustrationJaNai_V1_(?P<variant>ESRGAN|DAT2)_\d+k\.pth$", re.IGNORECASE)
+
+# (dirs, dir mtimes, [(root, filename), ...]) from the last walk of ./models
+_models_listing: tuple[list[str], tuple, list[tuple[str, str]]] | None = None
+# (model_type, scale) -> sorted height buckets, rebuilt whenever the config is normalized
+_height_lut: dict[tuple[str, str], list[int]] = {}
+# Whether any illustration model is mapped (also rebuilt on normalize)
+_has_illustration_models = False
+# (model_type, scale) pairs with at least one model mapped (also rebuilt on normalize)
+_mapped_scales: set[tuple[str, str]] = set()
+
+def _dirs_signature(dirs: list[str]) -> tuple:
+  sig = []
+  for d in dirs:
+    try:
+      sig.append(os.stat(d).st_mtime_ns)
+    except OSError:
+      sig.append(None)
+  return tuple(sig)
+
+def _walk_models_dir() -> list[tuple[str, str]]:
+  """
+  List (root, filename) for every file under ./models. The listing is reused until one of the
+  walked directories changes mtime (adding/removing an entry bumps its parent's mtime).
+  """
+  global _models_listing
+  cached = _models_listing
+  if cached is not None and _dirs_signature(cached[0]) == cached[1]:
+    return cached[2]
+  dirs: list[str] = []
+  files: list[tuple[str, str]] = []
+  stack = [MODELS_DIR]
+  while stack:
+    root = stack.pop()
+    dirs.append(root)
+    try:
+      with os.scandir(root) as it:
+        for entry in it:
+          # Dirent type info; no extra stat per entry. Don't follow dir symlinks (like os.walk).
+          if entry.is_dir(follow_symlinks=False):
+            stack.append(entry.path)
+          else:
+            files.append((root, entry.name))
+    except OSError:
+      continue
+  sig = _dirs_signature(dirs)
+  _models_listing = (dirs, sig, files)
+  return files
+
 def _scan_models_dir() -> dict[str, dict[str, dict[str, str]]]:
   """
   Scan ./models for MangaJaNai/IllustrationJaNai .pth filenames and build a map:
@@ -139,18 +197,16 @@ def _scan_models_dir() -> dict[str, dict[str, dict[str, str]]]:
   out: dict[str, dict[str, dict[str, str]]] = {}
   if not os.path.isdir(MODELS_DIR):
     return out
-  pat = re.compile(r"^(?P<scale>[24])x_(?P<kind>MangaJaNai|IllustrationJaNai)_(?P<h>\d+)p_.*\.pth$", re.IGNORECASE)
-  for root, _, files in os.walk(MODELS_DIR):
-    for fn in files:
-      m = pat.match(fn)
-      if not m:
-        continue
-      scale = m.group("scale")
-      h = m.group("h")
-      kind = m.group("kind").lower()
-      model_type = "illustration" if "illustration" in kind else "manga"
-      rel = os.path.relpath(os.path.join(root, fn), MODELS_DIR)
-      out.setdefault(model_type, {}).setdefault(scale, {})[h] = rel
+  for root, fn in _walk_models_dir():
+    m = _MODEL_SCAN_PAT.match(fn)
+    if not m:
+      continue
+    scale = m.group("scale")
+    h = m.group("h")
+    kind = m.group("kind").lower()
+    model_type = "illustration" if "illustration" in kind else "manga"
+    rel = os.path.relpath(os.path.join(root, fn), MODELS_DIR)
+    out.setdefault(model_type, {}).setdefault(scale, {})[h] = rel
   return out
 
 
@@ -163,17 +219,15 @@ def _scan_illustration_quality_models() -> dict[str, dict[str, str]]:
   out: dict[str, dict[str, str]] = {}
   if not os.path.isdir(MODELS_DIR):
     return out
-  pat = re.compile(r"^(?P<scale>[24])x_IllustrationJaNai_V1_(?P<variant>ESRGAN|DAT2)_\d+k\.pth$", re.IGNORECASE)
-  for root, _, files in os.walk(MODELS_DIR):
-    for fn in files:
-      m = pat.match(fn)
-      if not m:
-        continue
-      scale = m.group("scale")
-      variant = m.group("variant").lower()
-      q = "best" if "dat2" in variant else "balanced"
-      rel = os.path.relpath(os.path.join(root, fn), MODELS_DIR)
-      out.setdefault(scale, {})[q] = rel
+  for root, fn in _walk_models_dir():
+    m = _ILLU_QUALITY_PAT.match(fn)
+    if not m:
+      continue
+    scale = m.group("scale")
+    variant = m.group("variant").lower()
+    q = "best" if "dat2" in variant else "balanced"
+    rel = os.path.relpath(os.path.join(root, fn), MODELS_DIR)
+    out.setdefault(scale, {})[q] = rel
   for scale, mp in out.items():
     if "balanced" in mp and "fast" not in mp:
       mp["fast"] = mp["balanced"]
@@ -223,8 +277,42 @@ def _normalize_cfg(cfg: dict) -> dict:
     if "fast" in mp and "balanced" not in mp:
       mp["balanced"] = mp["fast"]
 
+  _build_height_lut(cfg)
   return cfg
 
+def _build_height_lut(cfg: dict) -> None:
+  # Per-request routing (height bucket, native scale, illustration availability) reads these
+  # instead of walking the nested config maps.
+  global _height_lut, _has_illustration_models, _mapped_scales
+  illu = (cfg.get("model_map_by_type") or {}).get("illustration") or {}
+  illu_q = cfg.get("illustration_by_quality") or {}
+  _has_illustration_models = any(bool(v) for v in illu.values()) or any(bool(v) for v in illu_q.values())
+  lut: dict[tuple[str, str], list[int]] = {}
+  mapped: set[tuple[str, str]] = set()
+  for model_type, scales in (cfg.get("model_map_by_type") or {}).items():
+    for scale, mp in (scales or {}).items():
+      if any(bool(v) for v in (mp or {}).values()):
+        mapped.add((model_type, str(scale)))
+      try:
+        lut[(model_type, str(scale))] = sorted(int(k) for k in (mp or {}).keys())
+      except ValueError:
+        continue
+  for scale, qmap in illu_q.items():
+    if any(bool(v) for v in (qmap or {}).values()):
+      mapped.add(("illustration", str(scale)))
+  _height_lut = lut
+  _mapped_scales = mapped
+
+def _nearest_height(choices: list[int], h: int) -> int:
+  # choices is sorted; ties go to the smaller bucket (same as min() over abs distance).
+  i = bisect.bisect_left(choices, h)
+  if i <= 0:
+    return choices[0]
+  if i >= len(choices):
+    return choices[-1]
+  lo, hi = choices[i - 1], choices[i]
+  return lo if (h - lo) <= (hi - h) else hi
+
 
 def load_cfg():
   if not os.path.exists(CFG_PATH):
@@ -240,6 +328,25 @@ def save_cfg(cfg: dict) -> None:
 
 CFG = load_cfg()
 
+def _make_http_session() -> requests.Session:
+  # One pooled session for upstream image fetches keeps TCP/TLS connections to CDNs warm.
+  sess = requests.Session()
+  # Retry transient connect failures and gateway errors quickly; a pooled connection that the
+  # CDN closed while idle then costs a reconnect instead of a failed page. Only idempotent
+  # methods are retried.
+  retry = Retry(total=2, connect=2, read=0, backoff_factor=0.1, status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset({"GET", "HEAD"}), raise_on_status=False)
+  adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=retry)
+  sess.mount("http://", adapter)
+  sess.mount("https://", adapter)
+  sess.headers["User-Agent"] = "MangaUpscalerHost/1.0"
+  # Shared across every image host: don't keep cookies one CDN sets and send them to the next
+  # fetch (and don't let the jar grow for the life of the process).
+  sess.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+  return sess
+
+_http = _make_http_session()
+
 def _log(msg: str) -> None:
   try:
     ts = time.strftime("%Y-%m-%d %H:%M:%S")
@@ -289,11 +396,11 @@ def _read_recent_telemetry(max_lines: int = 200) -> list[dict]:
 
 # Lazy-loaded models (kept in memory)
 _engine_lock = threading.Lock()
-_engine_cache: dict[str, object] = {}
-_engine_cache_order: list[str] = []
+_gpu_lock = threading.Lock()
+_engine_cache: OrderedDict[str, object] = OrderedDict()  # LRU: oldest first
 _engine_loading: dict[str, threading.Event] = {}
 _prewarm_started = False
-_wrapped_cache: dict[str, str] = {}
+_wrapped_cache: dict[tuple[str, int, int, bool], str] = {}  # (path, size, mtime_ns, fp16) -> loadable path
 _model_blocks: dict[str, int] = {}
 _cache_inflight_lock = threading.Lock()
 _cache_inflight: dict[str, threading.Event] = {}
@@ -302,6 +409,10 @@ _last_enhance_ts = 0.0
 _idle_stop = threading.Event()
 _active_enhances = 0
 _active_enhances_lock = threading.Lock()
+# Notified (under _active_enhances_lock) whenever _active_enhances changes; /events waits on it.
+_state_cond = threading.Condition(_active_enhances_lock)
+_state_version = 0
+EVENTS_HEARTBEAT_SEC = 15
 
 def _dedupe_cache_begin(cache_key: str) -> tuple[bool, threading.Event | None]:
   """
@@ -330,18 +441,180 @@ def _dedupe_cache_end(cache_key: str, evt: threading.Event | None):
     if cur is evt:
       _cache_inflight.pop(cache_key, None)
 
+# Cache files are written off the response path; one worker keeps disk writes sequential.
+_cache_write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mu-cache-write")
+
+def _cache_file_path(key: str, ext: str) -> str:
+  # Two-level fan-out keeps each directory small (NTFS lookups slow down in huge flat dirs).
+  return os.path.join(CACHE_DIR, key[:2], f"{key}.{ext}")
+
+# In-memory index of the disk cache so size eviction doesn't have to walk and stat the whole
+# tree. Filled by one scan on first use, then kept current by writes and hits.
+_disk_index_lock = threading.Lock()
+_disk_index: OrderedDict[str, tuple[int, float]] = OrderedDict()  # path -> (size, mtime), LRU order
+_disk_index_bytes = 0
+_disk_index_ready = False
+
+def _cache_max_bytes() -> int:
+  max_gb = float(CFG.get("cache_max_gb", 1.0) or 0)
+  return int(max_gb * (1024 ** 3)) if max_gb > 0 else 0
+
+def _disk_index_load() -> None:
+  global _disk_index_bytes, _disk_index_ready
+  if _disk_index_ready:
+    return
+  files = sorted(_iter_cache_files(include_wrapped=False), key=lambda x: x[2])
+  with _disk_index_lock:
+    if _disk_index_ready:
+      return
+    # Entries written while the scan ran are already indexed and more recent than anything found.
+    for path, size, mtime in reversed(files):
+      if path not in _disk_index:
+        _disk_index[path] = (size, mtime)
+        _disk_index.move_to_end(path, last=False)
+        _disk_index_bytes += size
+    _disk_index_ready = True
+
+def _disk_index_pop_over_budget(max_bytes: int) -> list[str]:
+  # Caller holds _disk_index_lock.
+  global _disk_index_bytes
+  evicted = []
+  while max_bytes > 0 and _disk_index_bytes > max_bytes and _disk_index:
+    path, (size, _) = _disk_index.popitem(last=False)
+    _disk_index_bytes -= size
+    evicted.append(path)
+  return evicted
+
+def _remove_files(paths: list[str]) -> None:
+  for path in paths:
+    try:
+      os.remove(path)
+    except OSError:
+      pass
+
+def _disk_index_add(cache_path: str, size: int) -> None:
+  global _disk_index_bytes
+  with _disk_index_lock:
+    old = _disk_index.pop(cache_path, None)
+    if old is not None:
+      _disk_index_bytes -= old[0]
+    _disk_index[cache_path] = (size, time.time())
+    _disk_index_bytes += size
+    # Until the initial scan lands the total is partial; _cleanup_cache_if_needed catches up.
+    evicted = _disk_index_pop_over_budget(_cache_max_bytes()) if _disk_index_ready else []
+  _remove_files(evicted)
+
+def _disk_index_touch(cache_path: str) -> None:
+  with _disk_index_lock:
+    entry = _disk_index.get(cache_path)
+    if entry is not None:
+      _disk_index[cache_path] = (entry[0], time.time())
+      _disk_index.move_to_end(cache_path)
+
+def _disk_index_clear() -> None:
+  global _disk_index_bytes
+  with _disk_index_lock:
+    _disk_index.clear()
+    _disk_index_bytes = 0
+
+def _write_cache_file(cache_path: str, data: bytes, evt: threading.Event | None) -> None:
+  # tmp + replace so concurrent readers never see a partial file. Waiters on evt are only
+  # released once the file is in place.
+  try:
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # Unique tmp name: the inline fallback in _write_cache_async can race the pool writer, and a
+    # second host process may share the cache dir.
+    tmp = f"{cache_path}.tmp{os.getpid()}-{threading.get_ident()}"
+    with open(tmp, "wb") as f:
+      f.write(data)
+    os.replace(tmp, cache_path)
+    _disk_index_add(cache_path, len(data))
+  except OSError as e:
+    _log(f"cache write failed: {e}")
+  finally:
+    _dedupe_cache_end(cache_path, evt)
+
+# Recently produced outputs kept in memory in front of the disk cache (hot panels are often
+# requested again right away, e.g. on re-render or by a prefetch racing the visible request).
+_mem_cache_lock = threading.Lock()
+_mem_cache: OrderedDict[str, bytes] = OrderedDict()  # cache_path -> bytes, LRU order
+_mem_cache_bytes = 0
+
+def _mem_cache_max_bytes() -> int:
+  try:
+    return max(0, int(float(CFG.get("memory_cache_mb", 128)) * 1024 * 1024))
+  except Exception:
+    return 0
+
+def _content_cache_key(hasher, outscale: int, quality: str, out_fmt: str) -> str:
+  # hasher: blake2b(digest_size=20) already fed the source image bytes.
+  hasher.update(f"::{outscale}::{quality}::{out_fmt}::v{CACHE_VERSION}".encode("utf-8"))
+  return hasher.hexdigest()
+
+def _read_cached(cache_path: str) -> bytes | None:
+  data = _mem_cache_get(cache_path)
+  if data is None:
+    try:
+      with open(cache_path, "rb") as f:
+        data = f.read()
+    except OSError:
+      return None
+  _disk_index_touch(cache_path)
+  return data
+
+def _mem_cache_get(cache_path: str) -> bytes | None:
+  with _mem_cache_lock:
+    data = _mem_cache.get(cache_path)
+    if data is not None:
+      _mem_cache.move_to_end(cache_path)
+    return data
+
+def _mem_cache_put(cache_path: str, data: bytes) -> bool:
+  global _mem_cache_bytes
+  cap = _mem_cache_max_bytes()
+  if len(data) > cap // 4:
+    return False
+  with _mem_cache_lock:
+    old = _mem_cache.pop(cache_path, None)
+    if old is not None:
+      _mem_cache_bytes -= len(old)
+    _mem_cache[cache_path] = data
+    _mem_cache_bytes += len(data)
+    while _mem_cache_bytes > cap and _mem_cache:
+      _, dropped = _mem_cache.popitem(last=False)
+      _mem_cache_bytes -= len(dropped)
+  return True
+
+def _mem_cache_clear() -> None:
+  global _mem_cache_bytes
+  with _mem_cache_lock:
+    _mem_cache.clear()
+    _mem_cache_bytes = 0
+
+def _write_cache_async(cache_path: str, data: bytes, evt: threading.Event | None) -> bool:
+  # Takes ownership of evt (returns True once it will be released by the writer).
+  if _mem_cache_put(cache_path, data):
+    # Duplicate requests waiting on this key can be answered from memory right away instead of
+    # after the disk write.
+    _dedupe_cache_end(cache_path, evt)
+    evt = None
+  try:
+    _cache_write_pool.submit(_write_cache_file, cache_path, data, evt)
+  except RuntimeError:
+    # Pool already shut down (interpreter exiting); write inline.
+    _write_cache_file(cache_path, data, evt)
+  return True
+
 def _pick_height(h: int, scale: int, model_type: str) -> int:
-  mp = CFG.get("model_map_by_type", {}).get(model_type, {}).get(str(scale), {})
-  choices = sorted(int(k) for k in mp.keys())
+  choices = _height_lut.get((model_type, str(scale)))
   if not choices:
     # fall back to any available scale in this type
     for s in ("4", "2"):
-      mp2 = CFG.get("model_map_by_type", {}).get(model_type, {}).get(s, {})
-      choices2 = sorted(int(k) for k in mp2.keys())
+      choices2 = _height_lut.get((model_type, s))
       if choices2:
-        return min(choices2, key=lambda x: abs(x - h))
+        return _nearest_height(choices2, h)
     return 1600
-  return min(choices, key=lambda x: abs(x - h))
+  return _nearest_height(choices, h)
 
 def _get_model_path(height_key: int, scale: int, model_type: str) -> str:
   mp = CFG.get("model_map_by_type", {}).get(model_type, {}).get(str(scale), {})
@@ -422,7 +695,67 @@ def _normalize_output_format(fmt: str | None) -> str:
 def _cache_ext_for_format(fmt: str) -> str:
   return "webp" if fmt == "webp" else "png"
 
-def _encode_output(out_img: Image.Image, fmt: str, is_gray: bool) -> tuple[bytes, str]:
+def _png_compress_level() -> int:
+  # zlib level for PNG output. 3 is a good size/speed balance for line art; 1 roughly halves
+  # encode time on large pages for slightly bigger files.
+  try:
+    return max(0, min(int(CFG.get("png_compress_level", 3)), 9))
+  except Exception:
+    return 3
+
+def _encode_png_fast(out_bgr: np.ndarray) -> bytes | None:
+  # Encode straight from the BGR ndarray, skipping the PIL image: libspng (optional pyspng) is
+  # the fastest; OpenCV's libpng takes BGR natively so it doesn't even need the channel swap.
+  # Returns None when neither is usable.
+  level = _png_compress_level()
+  try:
+    import pyspng
+  except ImportError:
+    pyspng = None
+  if pyspng is not None:
+    try:
+      # pyspng expects RGB; near-gray pages can still carry a tint, so always swap.
+      return pyspng.encode(_swap_rb(out_bgr), compress_level=level)
+    except Exception as e:
+      _log(f"pyspng encode failed; falling back: {e}")
+  try:
+    import cv2
+    ok, enc = cv2.imencode(".png", out_bgr, [cv2.IMWRITE_PNG_COMPRESSION, level])
+    if ok:
+      return enc.tobytes()
+  except ImportError:
+    pass
+  except Exception as e:
+    _log(f"cv2 PNG encode failed; falling back to Pillow: {e}")
+  return None
+
+def _encode_webp_fast(out_bgr: np.ndarray, is_gray: bool) -> bytes | None:
+  # libwebp through OpenCV takes BGR directly (no swap, no PIL image). Lossless uses libwebp's
+  # default effort rather than Pillow's quality=100 (max effort), which is several times slower
+  # on full pages for a few percent smaller files. Returns None without OpenCV.
+  try:
+    import cv2
+  except ImportError:
+    return None
+  try:
+    # OpenCV switches to lossless for quality > 100.
+    ok, enc = cv2.imencode(".webp", out_bgr, [cv2.IMWRITE_WEBP_QUALITY, 101 if is_gray else 95])
+    if ok:
+      return enc.tobytes()
+  except Exception as e:
+    _log(f"cv2 WEBP encode failed; falling back to Pillow: {e}")
+  return None
+
+def _encode_output(out_bgr: np.ndarray, fmt: str, is_gray: bool) -> tuple[bytes, str]:
+  if fmt == "png":
+    data = _encode_png_fast(out_bgr)
+    if data is not None:
+      return data, "image/png"
+  elif fmt == "webp":
+    data = _encode_webp_fast(out_bgr, is_gray)
+    if data is not None:
+      return data, "image/webp"
+  out_img = Image.fromarray(_swap_rb(out_bgr))
   buf = io.BytesIO()
   if fmt == "webp":
     try:
@@ -437,25 +770,15 @@ def _encode_output(out_img: Image.Image, fmt: str, is_gray: bool) -> tuple[bytes
       _log(f"WEBP encode failed; falling back to PNG: {e}")
       buf = io.BytesIO()
   # PNG optimize can be surprisingly slow on large images; favor speed.
-  out_img.save(buf, format="PNG", compress_level=3)
+  out_img.save(buf, format="PNG", compress_level=_png_compress_level())
   return buf.getvalue(), "image/png"
 
 def _has_manga_scale(scale: int) -> bool:
-  try:
-    mp = CFG.get("model_map_by_type", {}).get("manga", {}).get(str(scale), {})
-    return any(bool(v) for v in (mp or {}).values())
-  except Exception:
-    return False
+  return ("manga", str(scale)) in _mapped_scales
 
 def _has_illustration_scale(scale: int) -> bool:
-  try:
-    mp_q = CFG.get("illustration_by_quality", {}).get(str(scale), {})
-    if any(bool(v) for v in (mp_q or {}).values()):
-      return True
-    mp = CFG.get("model_map_by_type", {}).get("illustration", {}).get(str(scale), {})
-    return any(bool(v) for v in (mp or {}).values())
-  except Exception:
-    return False
+  # Either a quality-mapped or a height-mapped illustration model.
+  return ("illustration", str(scale)) in _mapped_scales
 
 def _model_scale_for_outscale(outscale: int, model_type: str, quality: str) -> int:
   # Prefer a native-scale model when possible. For 3x, use 2x Manga models + resize to 3x
@@ -477,33 +800,39 @@ def _model_scale_for_outscale(outscale: int, model_type: str, quality: str) -> i
 def _is_dat2_filename(name: str) -> bool:
   return "dat2" in name.lower()
 
+@functools.lru_cache(maxsize=1)
 def _dat_arch_available() -> bool:
+  # find_spec imports basicsr.archs (which imports every arch module); the answer can't change
+  # while the process runs.
   return importlib.util.find_spec("basicsr.archs.dat_arch") is not None
 
+_RDB_CONV_PAT = re.compile(r"\.conv(\d+)\.0\.")
+_RDB_INDEX_PAT = re.compile(r"^(?:model\.1\.sub|body)\.(\d+)\.")
+
+# Old-style ESRGAN "model.<idx>." prefixes -> RRDBNet module names (model.1 is the RRDB trunk).
+_ESRGAN_PREFIX_MAP = {"0": "conv_first.", "3": "conv_up1.", "6": "conv_up2.", "8": "conv_hr.", "10": "conv_last."}
+
 def _convert_esrgan_state_dict(state: dict) -> dict:
   if not any(k.startswith("model.") for k in state.keys()):
     return state
   out: dict[str, object] = {}
   for k, v in state.items():
-    if k.startswith("model.0."):
-      nk = "conv_first." + k[len("model.0."):]
-    elif k.startswith("model.1.sub."):
-      suffix = k[len("model.1.sub."):]
+    head, _, rest = k.partition(".")
+    if head != "model":
+      continue
+    idx, _, rest = rest.partition(".")
+    prefix = _ESRGAN_PREFIX_MAP.get(idx)
+    if prefix is not None:
+      nk = prefix + rest
+    elif idx == "1" and rest.startswith("sub."):
+      suffix = rest[len("sub."):]
       # model.1.sub.23.* is the conv_body in ESRGAN/RRDBNet.
       if ".RDB" not in suffix and (suffix.endswith(".weight") or suffix.endswith(".bias")):
         nk = "conv_body." + suffix.split(".", 1)[-1]
       else:
         nk = "body." + suffix
         nk = nk.replace(".RDB", ".rdb")
-        nk = re.sub(r"\.conv(\d+)\.0\.", r".conv\1.", nk)
-    elif k.startswith("model.3."):
-      nk = "conv_up1." + k[len("model.3."):]
-    elif k.startswith("model.6."):
-      nk = "conv_up2." + k[len("model.6."):]
-    elif k.startswith("model.8."):
-      nk = "conv_hr." + k[len("model.8."):]
-    elif k.startswith("model.10."):
-      nk = "conv_last." + k[len("model.10."):]
+        nk = _RDB_CONV_PAT.sub(r".conv\1.", nk)
     else:
       continue
     out[nk] = v
@@ -514,7 +843,7 @@ def _detect_num_blocks(state: dict) -> int | None:
   for k in state.keys():
     if ".RDB" not in k and ".rdb" not in k:
       continue
-    m = re.match(r"^(?:model\\.1\\.sub|body)\\.(\\d+)\\.", k)
+    m = _RDB_INDEX_PAT.match(k)
     if not m:
       continue
     idx = int(m.group(1))
@@ -539,26 +868,61 @@ def _ensure_conv_hr(state: dict) -> dict:
       break
   return state
 
-def _wrap_model_if_needed(model_path: str) -> str:
-  cached_path = _wrapped_cache.get(model_path)
-  if cached_path:
-    if os.path.exists(cached_path):
-      if cached_path not in _model_blocks:
-        import torch
-        state = torch.load(cached_path, map_location="cpu", weights_only=True)
-        if isinstance(state, dict) and ("params" in state or "params_ema" in state):
-          sd = state.get("params_ema") or state.get("params") or {}
-        elif isinstance(state, dict) and "state_dict" in state:
-          sd = state["state_dict"]
-        else:
-          sd = state
-        num_blocks = _detect_num_blocks(sd) if isinstance(sd, dict) else None
-        if num_blocks:
-          _model_blocks[cached_path] = num_blocks
-      return cached_path
-    _wrapped_cache.pop(model_path, None)
+def _read_wrap_meta(meta_path: str) -> dict | None:
+  try:
+    with open(meta_path, "r", encoding="utf-8") as f:
+      meta = json.load(f)
+    return meta if isinstance(meta, dict) else None
+  except (OSError, ValueError):
+    return None
+
+def _write_wrap_meta(meta_path: str, wrapped: bool, num_blocks: int | None) -> None:
+  try:
+    tmp = meta_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+      json.dump({"wrapped": bool(wrapped), "num_blocks": num_blocks}, f)
+    os.replace(tmp, meta_path)
+  except OSError:
+    pass
+
+def _torch_load_cpu(path: str):
+  # mmap (torch >= 2.1, zipfile-format checkpoints): tensor storage is paged in from the file as
+  # the conversion reads it instead of being copied into process memory up front. Legacy
+  # (pre-1.6) checkpoints and older torch fall back to a regular load.
+  import torch
+  try:
+    return torch.load(path, map_location="cpu", weights_only=True, mmap=True)
+  except (TypeError, RuntimeError, ValueError):
+    return torch.load(path, map_location="cpu", weights_only=True)
+
+def _wrap_model_if_needed(model_path: str, half: bool = False) -> str:
+  # half: store the weights as FP16. FP16 engines cast them anyway, so the result is identical,
+  # while the file (and every torch.load of it on an engine swap) is half the size.
+  stat = os.stat(model_path)
+  memo_key = (model_path, stat.st_size, stat.st_mtime_ns, half)
+  cached_path = _wrapped_cache.get(memo_key)
+  if cached_path and os.path.exists(cached_path):
+    return cached_path
+
+  sig = f"{model_path}:{stat.st_size}:{int(stat.st_mtime)}:v4" + ("-fp16" if half else "")
+  h = hashlib.sha1(sig.encode("utf-8")).hexdigest()
+  wrapped_path = os.path.join(WRAPPED_DIR, f"{h}.pth")
+  meta_path = os.path.join(WRAPPED_DIR, f"{h}.json")
+
+  # Persisted wrap result from a previous run: skip loading/converting the original .pth.
+  meta = _read_wrap_meta(meta_path)
+  if meta:
+    target = wrapped_path if meta.get("wrapped") else model_path
+    if os.path.exists(target):
+      num_blocks = meta.get("num_blocks")
+      if num_blocks:
+        _model_blocks[model_path] = num_blocks
+        _model_blocks[target] = num_blocks
+      _wrapped_cache[memo_key] = target
+      return target
+
   import torch
-  state = torch.load(model_path, map_location="cpu", weights_only=True)
+  state = _torch_load_cpu(model_path)
   if isinstance(state, dict) and ("params" in state or "params_ema" in state):
     sd = state.get("params_ema") or state.get("params") or {}
     needs_wrap = False
@@ -571,8 +935,9 @@ def _wrap_model_if_needed(model_path: str) -> str:
     num_blocks = _detect_num_blocks(sd) if isinstance(sd, dict) else None
     if num_blocks:
       _model_blocks[model_path] = num_blocks
-    if not needs_wrap:
-      _wrapped_cache[model_path] = model_path
+    if not needs_wrap and not half:
+      _wrapped_cache[memo_key] = model_path
+      _write_wrap_meta(meta_path, False, num_blocks)
       return model_path
     state = sd
   else:
@@ -587,13 +952,12 @@ def _wrap_model_if_needed(model_path: str) -> str:
     num_blocks = _detect_num_blocks(state) if isinstance(state, dict) else None
     if num_blocks:
       _model_blocks[model_path] = num_blocks
-  stat = os.stat(model_path)
-  sig = f"{model_path}:{stat.st_size}:{int(stat.st_mtime)}:v4"
-  h = hashlib.sha1(sig.encode("utf-8")).hexdigest()
-  wrapped_path = os.path.join(WRAPPED_DIR, f"{h}.pth")
+  if half:
+    state = {k: (v.half() if torch.is_tensor(v) and v.is_floating_point() else v) for k, v in state.items()}
   if not os.path.exists(wrapped_path):
     torch.save({"params": state}, wrapped_path)
-  _wrapped_cache[model_path] = wrapped_path
+  _write_wrap_meta(meta_path, True, num_blocks)
+  _wrapped_cache[memo_key] = wrapped_path
   if model_path in _model_blocks:
     _model_blocks[wrapped_path] = _model_blocks[model_path]
   return wrapped_path
@@ -625,6 +989,33 @@ def _ensure_torchvision_compat():
   )
   sys.modules["torchvision.transforms.functional_tensor"] = mod
 
+_torch_configured = False
+
+def _configure_torch_once() -> None:
+  global _torch_configured
+  if _torch_configured:
+    return
+  _torch_configured = True
+  try:
+    import torch
+    # cuDNN autotuning re-runs for every new input shape; only worth it when page sizes repeat.
+    torch.backends.cudnn.benchmark = bool(CFG.get("cudnn_benchmark", False))
+    # TF32 for the FP32 ("best") engines on Ampere+. Convolutions already default to it; make
+    # that explicit and let any matmuls (e.g. compiled graphs) use it too.
+    torch.backends.cudnn.allow_tf32 = True
+    torch.set_float32_matmul_precision("high")
+  except Exception:
+    pass
+
+def _use_half(quality: str | None) -> bool:
+  prof = QUALITY_PROFILES.get(_normalize_quality(quality), QUALITY_PROFILES["balanced"])
+  return bool(CFG.get("use_fp16", True)) if prof["half"] else False
+
+def _engine_key(model_path: str, model_scale: int, quality: str) -> str:
+  # Profiles that only differ in tiling share one engine (tile/tile_pad are applied per call),
+  # so fast <-> balanced doesn't keep two GPU copies of the same weights.
+  return f"{model_path}::x{model_scale}::fp16={_use_half(quality)}"
+
 def _load_engine(model_path: str, scale: int, quality: str):
   # Import heavy deps only when needed
   _ensure_torchvision_compat()
@@ -636,13 +1027,14 @@ def _load_engine(model_path: str, scale: int, quality: str):
   # MangaJaNai V1 models are ESRGAN/RRDB-style.
   # Use RRDBNet like the Real-ESRGAN demo does for custom ESRGAN models.
   # (You can adjust in config.json if you use a different arch.)
-  model_path = _wrap_model_if_needed(model_path)
+  half = _use_half(quality)
+  model_path = _wrap_model_if_needed(model_path, half=half)
   num_block = _model_blocks.get(model_path, 23)
   model = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=64, num_block=num_block, num_grow_ch=32, scale=scale)
 
   prof = QUALITY_PROFILES.get(_normalize_quality(quality), QUALITY_PROFILES["balanced"])
-  half = bool(CFG.get("use_fp16", True)) if prof["half"] else False
   device = "cuda" if torch.cuda.is_available() else "cpu"
+  _configure_torch_once()
   _log(f"Loading model {os.path.basename(model_path)} x{scale} {quality} device={device} fp16={half} tile={prof['tile']}")
   if device == "cpu":
     _log("CUDA not available; using CPU (slow). Reinstall Torch with CUDA in the host .venv.")
@@ -656,36 +1048,117 @@ def _load_engine(model_path: str, scale: int, quality: str):
     half=half,
     gpu_id=0
   )
+  engine.tile_process = types.MethodType(_tile_process, engine)
+  # Inference only: no parameter ever needs autograd state (also keeps compiled graphs free of
+  # grad-mode guards).
+  engine.model.requires_grad_(False)
+  if device == "cuda" and bool(CFG.get("channels_last", False)):
+    # NHWC can map better onto Tensor Cores for RRDB convs, but it's GPU-dependent; opt-in.
+    engine.model = engine.model.to(memory_format=torch.channels_last)
+  if device == "cuda" and bool(CFG.get("torch_compile", False)):
+    _try_compile_engine(engine)
   return engine
 
-def _detect_grayscale(img: Image.Image) -> bool:
-  # Resize for speed and compute color channel divergence while ignoring pure black/white.
+def _try_compile_engine(engine) -> None:
+  # Opt-in: torch.compile needs a working Triton install, which many Windows setups lack.
+  # A tiny warm-up forward here pays the compile on the engine load (usually the prewarm thread)
+  # instead of the first page, and reverts to eager right away if compilation doesn't work.
+  import torch
+  if not hasattr(torch, "compile"):
+    return
+  # Persist Inductor's kernel cache next to the wrapped models so restarts reuse it (and cache
+  # cleanup, which skips wrapped_models, leaves it alone).
+  os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.join(WRAPPED_DIR, "inductor"))
+  eager = engine.model
+  try:
+    # "reduce-overhead" adds CUDA graphs (one capture per page shape; pays off on sites with
+    # uniform page sizes), "max-autotune" trades a much longer first call for faster kernels.
+    mode = str(CFG.get("torch_compile_mode") or "default")
+    if mode not in ("default", "reduce-overhead", "max-autotune"):
+      mode = "default"
+    # Page sizes vary per request; dynamic shapes avoid a recompile for every new size.
+    compiled = torch.compile(eager, mode=mode, dynamic=True)
+    dtype = torch.float16 if engine.half else torch.float32
+    with torch.inference_mode():
+      compiled(torch.zeros((1, 3, 64, 64), dtype=dtype, device=engine.device))
+    engine.model = compiled
+    # Kept so _enhance_single can still fall back if a later shape fails to compile.
+    engine._mu_eager_model = eager
+  except Exception as e:
+    engine.model = eager
+    _log(f"torch.compile unavailable; using eager model: {e}")
+
+def _gray_ratio(arr: np.ndarray, threshold: int) -> float | None:
+  # Mean per-channel divergence above threshold over sampled pixels, ignoring pure black/white.
+  # None when every sampled pixel is pure black or white.
+  import numpy as np
+  # |r-g|, |r-b|, |g-b| in one vectorized op; thresholded in place to avoid more temporaries.
+  diff = np.abs(arr[:, :, [0, 0, 1]] - arr[:, :, [1, 2, 2]])
+  diff -= threshold
+  np.maximum(diff, 0, out=diff)
+  diff_px = diff.sum(axis=2)
+
+  # Pure black <=> max channel is 0; pure white <=> min channel is 255.
+  keep = (arr.max(axis=2) != 0) & (arr.min(axis=2) != 255)
+  size_wo = int(np.count_nonzero(keep)) * 3
+  if size_wo == 0:
+    return None
+  return float(diff_px[keep].sum()) / size_wo
+
+def _detect_grayscale(arr: np.ndarray) -> bool:
+  # Sample for speed and compute color channel divergence while ignoring pure black/white.
+  # The metric is symmetric in the channels, so RGB and BGR input give the same answer.
   import numpy as np
-  thumb = img.copy()
-  thumb.thumbnail((96, 96))
-  arr = np.asarray(thumb.convert("RGB"), dtype=np.uint8)
   if arr.ndim != 3 or arr.shape[2] < 3:
     return True
-  r = arr[:, :, 0].astype(np.int16)
-  g = arr[:, :, 1].astype(np.int16)
-  b = arr[:, :, 2].astype(np.int16)
-
+  h, w = arr.shape[:2]
   threshold = int(CFG.get("grayscale_detection_threshold", 12))
-  diff_rg = np.maximum(np.abs(r - g) - threshold, 0)
-  diff_rb = np.maximum(np.abs(r - b) - threshold, 0)
-  diff_gb = np.maximum(np.abs(g - b) - threshold, 0)
+  limit = threshold / 12.0
+  # Strided views instead of a resize: only the sampled pixels are ever read (a resize touches
+  # the whole page). Clearly coloured pages are settled from a ~64px grid; everything else gets
+  # the full ~256px one.
+  step = max(1, max(h, w) // 256)
+  coarse = arr[::step * 4, ::step * 4, :3].astype(np.int16)
+  ratio = _gray_ratio(coarse, threshold)
+  if ratio is not None and ratio > limit * 3:
+    return False
+  ratio = _gray_ratio(arr[::step, ::step, :3].astype(np.int16), threshold)
+  if ratio is None:
+    return False
+  return ratio <= limit
 
-  pure_black = (r == 0) & (g == 0) & (b == 0)
-  pure_white = (r == 255) & (g == 255) & (b == 255)
-  exclude = pure_black | pure_white
+_CV2_MAGIC = (b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n", b"BM")
 
-  diff_sum = (diff_rg + diff_rb + diff_gb)
-  diff_sum = diff_sum[~exclude].sum()
-  size_wo = (~exclude).sum() * 3
-  if size_wo == 0:
-    return False
-  ratio = diff_sum / size_wo
-  return ratio <= (threshold / 12.0)
+def _cv2_can_decode(img_bytes: bytes) -> bool:
+  # JPEG / PNG / BMP / WebP: the formats manga CDNs serve and OpenCV decodes natively.
+  return img_bytes.startswith(_CV2_MAGIC) or (img_bytes[:4] == b"RIFF" and img_bytes[8:12] == b"WEBP")
+
+def _decode_bgr(img_bytes: bytes) -> np.ndarray:
+  # Decode straight to the BGR uint8 layout RealESRGANer expects: no PIL image, no channel flip.
+  import numpy as np
+  if _cv2_can_decode(img_bytes):
+    try:
+      import cv2
+      # Match Pillow: don't apply EXIF rotation.
+      arr = cv2.imdecode(np.frombuffer(img_bytes, dtype=np.uint8), cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+      if arr is not None:
+        return arr
+    except ImportError:
+      pass
+  # No OpenCV, or a format it can't read (e.g. GIF).
+  img = Image.open(io.BytesIO(img_bytes))
+  if img.mode != "RGB":
+    img = img.convert("RGB")
+  return _swap_rb(np.asarray(img))
+
+def _swap_rb(arr: np.ndarray) -> np.ndarray:
+  # RGB <-> BGR into one contiguous buffer. OpenCV ships with realesrgan; numpy fallback otherwise.
+  try:
+    import cv2
+    return cv2.cvtColor(arr, cv2.COLOR_RGB2BGR)
+  except ImportError:
+    import numpy as np
+    return np.ascontiguousarray(arr[:, :, ::-1])
 
 def _should_apply_residual(model_path: str) -> bool:
   if not CFG.get("residual_add", True):
@@ -697,69 +1170,77 @@ def _should_apply_residual(model_path: str) -> bool:
   name = os.path.basename(model_path).lower()
   return any(pat.lower() in name for pat in patterns)
 
-def _apply_residual_add(out_rgb, src_img: Image.Image, strength: float) -> np.ndarray:
+def _apply_residual_add(out_img: np.ndarray, src_img: np.ndarray, strength: float) -> np.ndarray:
+  # Channel order agnostic: both arrays just need the same layout.
   import numpy as np
-  base = src_img.resize((out_rgb.shape[1], out_rgb.shape[0]), resample=Image.BICUBIC)
-  base_np = np.asarray(base, dtype=np.float32)
-  out_np = out_rgb.astype(np.float32)
-  res = base_np + out_np * float(strength)
-  return np.clip(res, 0, 255).astype(np.uint8)
+  size = (out_img.shape[1], out_img.shape[0])
+  # Pillow's bicubic (a=-0.5) on purpose: cv2's INTER_CUBIC uses a=-0.75 and rings more around
+  # line art, which would change outputs already in the cache under the same CACHE_VERSION.
+  base = np.asarray(Image.fromarray(src_img).resize(size, resample=Image.BICUBIC))
+  try:
+    import cv2
+  except ImportError:
+    cv2 = None
+  if cv2 is not None:
+    # base + out*strength with uint8 saturation in a single pass; no float32 copies of the page.
+    return cv2.addWeighted(out_img, float(strength), base, 1.0, 0.0)
+  res = base.astype(np.float32)
+  res += out_img * np.float32(strength)
+  return np.clip(res, 0, 255, out=res).astype(np.uint8)
 
 def _iter_cache_files(include_wrapped: bool = False):
-  wrapped = os.path.abspath(WRAPPED_DIR)
-  root_abs = os.path.abspath(CACHE_DIR)
-  for root, dirs, files in os.walk(root_abs):
-    if not include_wrapped:
-      dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != wrapped and d != "wrapped_models"]
-    for fn in files:
-      path = os.path.join(root, fn)
-      if not include_wrapped and os.path.abspath(path).startswith(wrapped):
-        continue
-      try:
-        st = os.stat(path)
-      except OSError:
-        continue
-      yield path, st.st_size, st.st_mtime
+  # os.scandir: directory entries carry their type, so only files get a stat (on Windows the
+  # stat comes from the directory listing too).
+  wrapped = os.path.normcase(os.path.abspath(WRAPPED_DIR))
+  stack = [os.path.abspath(CACHE_DIR)]
+  while stack:
+    try:
+      it = os.scandir(stack.pop())
+    except OSError:
+      continue
+    with it:
+      for entry in it:
+        try:
+          if entry.is_dir(follow_symlinks=False):
+            if include_wrapped or (entry.name != "wrapped_models" and os.path.normcase(entry.path) != wrapped):
+              stack.append(entry.path)
+            continue
+          if not entry.is_file(follow_symlinks=False):
+            continue
+          st = entry.stat(follow_symlinks=False)
+        except OSError:
+          continue
+        yield entry.path, st.st_size, st.st_mtime
 
 def _cleanup_cache_if_needed(force: bool = False) -> None:
-  global _last_cache_cleanup
+  global _last_cache_cleanup, _disk_index_bytes
   now = time.time()
   if not force and (now - _last_cache_cleanup) < CACHE_CLEANUP_INTERVAL_SEC:
     return
   _last_cache_cleanup = now
+  _disk_index_load()
 
-  max_gb = float(CFG.get("cache_max_gb", 1.0) or 0)
-  max_bytes = int(max_gb * (1024 ** 3)) if max_gb > 0 else 0
   max_age_days = int(CFG.get("cache_max_age_days", 0) or 0)
   cutoff = now - (max_age_days * 86400) if max_age_days > 0 else 0
 
-  files = list(_iter_cache_files(include_wrapped=False))
-
-  # Age-based cleanup
-  if cutoff > 0:
-    for path, _, mtime in files:
-      if mtime < cutoff:
-        try:
-          os.remove(path)
-        except OSError:
-          pass
-    files = list(_iter_cache_files(include_wrapped=False))
-
-  # Size-based cleanup
-  if max_bytes > 0:
-    total = sum(size for _, size, _ in files)
-    if total > max_bytes:
-      files.sort(key=lambda x: x[2])  # oldest first
-      for path, size, _ in files:
-        try:
-          os.remove(path)
-        except OSError:
-          pass
-        total -= size
-        if total <= max_bytes:
+  with _disk_index_lock:
+    evicted = []
+    # Age-based cleanup: the index is in last-use order, so expired entries are all at the front.
+    if cutoff > 0:
+      while _disk_index:
+        path, (size, mtime) = next(iter(_disk_index.items()))
+        if mtime >= cutoff:
           break
+        del _disk_index[path]
+        _disk_index_bytes -= size
+        evicted.append(path)
+    # Size-based cleanup (writes evict as they go; this catches a lowered cache_max_gb).
+    evicted.extend(_disk_index_pop_over_budget(_cache_max_bytes()))
+  _remove_files(evicted)
 
 def _clear_cache(include_wrapped: bool = False) -> int:
+  _mem_cache_clear()
+  _disk_index_clear()
   removed = 0
   for path, _, _ in _iter_cache_files(include_wrapped=include_wrapped):
     try:
@@ -775,14 +1256,18 @@ def _touch_enhance():
 
 @contextmanager
 def _enhance_activity():
-  global _active_enhances
-  with _active_enhances_lock:
+  global _active_enhances, _state_version
+  with _state_cond:
     _active_enhances += 1
+    _state_version += 1
+    _state_cond.notify_all()
   try:
     yield
   finally:
-    with _active_enhances_lock:
+    with _state_cond:
       _active_enhances = max(0, _active_enhances - 1)
+      _state_version += 1
+      _state_cond.notify_all()
 
 def _status_payload() -> dict:
   with _active_enhances_lock:
@@ -815,10 +1300,25 @@ def _idle_monitor(httpd):
       return
     _idle_stop.wait(5)
 
+def _copy_response(resp, f) -> None:
+  # Straight from the urllib3 stream into the file in 4 MiB blocks; iter_content's generator
+  # adds a Python-level hop (and a bytes object) per chunk.
+  resp.raw.decode_content = True
+  shutil.copyfileobj(resp.raw, f, length=4 * 1024 * 1024)
+
+def _read_response(resp, hasher) -> bytearray:
+  # Hash each decoded chunk as it arrives, while it's still hot, instead of a second full pass
+  # over the finished download.
+  buf = bytearray()
+  for chunk in resp.raw.stream(256 * 1024, decode_content=True):
+    hasher.update(chunk)
+    buf += chunk
+  return buf
+
 def _download_models(allow_dat2: bool) -> dict:
   os.makedirs(MODELS_DIR, exist_ok=True)
   api_url = "https://api.github.com/repos/the-database/MangaJaNai/releases/tags/1.0.0"
-  r = requests.get(api_url, timeout=30)
+  r = _http.get(api_url, timeout=30)
   r.raise_for_status()
   data = r.json()
   assets = {a.get("name"): a.get("browser_download_url") for a in data.get("assets", [])}
@@ -827,18 +1327,12 @@ def _download_models(allow_dat2: bool) -> dict:
     "IllustrationJaNai_V1_ModelsOnly.zip"
   ]
 
-  imported = []
-  for name in wanted:
-    url = assets.get(name)
-    if not url:
-      continue
+  def fetch_and_extract(name: str, url: str) -> str:
     tmp_zip = os.path.join(CACHE_DIR, f"dl_{name}")
-    with requests.get(url, stream=True, timeout=120) as resp:
+    with _http.get(url, stream=True, timeout=120) as resp:
       resp.raise_for_status()
       with open(tmp_zip, "wb") as f:
-        for chunk in resp.iter_content(chunk_size=1024 * 1024):
-          if chunk:
-            f.write(chunk)
+        _copy_response(resp, f)
     import zipfile
     with zipfile.ZipFile(tmp_zip, "r") as zf:
       zf.extractall(MODELS_DIR)
@@ -846,7 +1340,17 @@ def _download_models(allow_dat2: bool) -> dict:
       os.remove(tmp_zip)
     except OSError:
       pass
-    imported.append(name)
+    return name
+
+  # The two packs are independent: download (network-bound) and inflate (zlib releases the GIL)
+  # them side by side.
+  jobs = [(name, assets.get(name)) for name in wanted if assets.get(name)]
+  imported = []
+  if jobs:
+    with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="mu-model-dl") as pool:
+      futures = [pool.submit(fetch_and_extract, name, url) for name, url in jobs]
+      # Keep the upstream order; .result() re-raises a failed download like the serial loop did.
+      imported = [fut.result() for fut in futures]
 
   # Optional: 2x IllustrationJaNai V1 ESRGAN model (not included in the upstream "ModelsOnly" zips).
   extra_model = "2x_IllustrationJaNai_V1_ESRGAN_120k.pth"
@@ -855,13 +1359,11 @@ def _download_models(allow_dat2: bool) -> dict:
     extra_url = os.environ.get("MU_ILLU_2X_URL") or f"https://github.com/softlynn/mangaupscaler/releases/download/alpha/{extra_model}"
     try:
       _log(f"Downloading extra model {extra_model}")
-      with requests.get(extra_url, stream=True, timeout=240) as resp:
+      with _http.get(extra_url, stream=True, timeout=240) as resp:
         resp.raise_for_status()
         tmp = extra_path + ".tmp"
         with open(tmp, "wb") as f:
-          for chunk in resp.iter_content(chunk_size=1024 * 1024):
-            if chunk:
-              f.write(chunk)
+          _copy_response(resp, f)
         os.replace(tmp, extra_path)
       imported.append(extra_model)
     except Exception as e:
@@ -890,10 +1392,7 @@ def _choose_model_type(is_grayscale: bool) -> str:
   if is_grayscale:
     return "manga"
   # prefer illustration if any are available
-  illu = CFG.get("model_map_by_type", {}).get("illustration", {})
-  illu_q = CFG.get("illustration_by_quality", {})
-  has_illu = any(bool(v) for v in illu.values()) or any(bool(v) for v in illu_q.values())
-  return "illustration" if has_illu else "manga"
+  return "illustration" if _has_illustration_models else "manga"
 
 def _engine_cache_max() -> int:
   try:
@@ -904,16 +1403,11 @@ def _engine_cache_max() -> int:
 
 def _evict_engines_if_needed():
   max_n = _engine_cache_max()
-  while len(_engine_cache_order) > max_n:
-    old_key = _engine_cache_order.pop(0)
-    eng = _engine_cache.pop(old_key, None)
-    if eng is None:
-      continue
-    try:
-      # Best-effort: release references; CUDA memory is reclaimed when objects are freed.
-      del eng
-    except Exception:
-      pass
+  if len(_engine_cache) <= max_n:
+    return
+  while len(_engine_cache) > max_n:
+    # Release our reference; CUDA memory is reclaimed once in-flight requests drop theirs too.
+    _engine_cache.popitem(last=False)
   # Best-effort: free CUDA cache after evictions.
   try:
     import torch  # type: ignore
@@ -928,12 +1422,7 @@ def _get_engine(key: str, model_path: str, model_scale: int, quality: str):
     with _engine_lock:
       eng = _engine_cache.get(key)
       if eng is not None:
-        try:
-          if key in _engine_cache_order:
-            _engine_cache_order.remove(key)
-          _engine_cache_order.append(key)
-        except Exception:
-          pass
+        _engine_cache.move_to_end(key)
         return eng
       evt = _engine_loading.get(key)
       if evt is None:
@@ -950,12 +1439,7 @@ def _get_engine(key: str, model_path: str, model_scale: int, quality: str):
     eng = _load_engine(model_path, model_scale, quality)
     with _engine_lock:
       _engine_cache[key] = eng
-      try:
-        if key in _engine_cache_order:
-          _engine_cache_order.remove(key)
-        _engine_cache_order.append(key)
-      except Exception:
-        pass
+      _engine_cache.move_to_end(key)
       _evict_engines_if_needed()
     return eng
   finally:
@@ -991,7 +1475,7 @@ def _prewarm_engines():
         model_scale = _model_scale_for_outscale(outscale, model_type, q)
         height_key = _pick_height(1600, model_scale, model_type)
         model_path = _get_model_path(height_key, model_scale, model_type)
-        key = f"{model_path}::x{model_scale}::q={q}"
+        key = _engine_key(model_path, model_scale, q)
         _get_engine(key, model_path, model_scale, q)
       except Exception:
         pass
@@ -1001,7 +1485,7 @@ def _prewarm_engines():
         model_scale = _model_scale_for_outscale(outscale, model_type, q)
         model_path = _get_illustration_model_path(model_scale, q)
         if model_path:
-          key = f"{model_path}::x{model_scale}::q={q}"
+          key = _engine_key(model_path, model_scale, q)
           _get_engine(key, model_path, model_scale, q)
       except Exception:
         pass
@@ -1010,46 +1494,114 @@ def _prewarm_engines():
 
   threading.Thread(target=run, daemon=True).start()
 
-def enhance_bytes(img_bytes: bytes, outscale: int, quality: str | None, out_format: str | None = None) -> tuple[bytes, str, str]:
-  _prewarm_engines()
-  img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-  w, h = img.size
+def _cuda_free_bytes() -> int | None:
+  try:
+    import torch
+    if not torch.cuda.is_available():
+      return None
+    free, _ = torch.cuda.mem_get_info()
+    return int(free)
+  except Exception:
+    return None
 
-  # Choose model by grayscale detection + input height.
-  is_gray = _detect_grayscale(img)
-  model_type = _choose_model_type(is_gray)
-  q = _normalize_quality(quality)
-  outscale = _normalize_outscale(outscale)
-  fmt = _normalize_output_format(out_format)
-  model_path = None
-  height_key = None
-  model_scale = _model_scale_for_outscale(outscale, model_type, q)
-  if model_type == "illustration":
-    model_path = _get_illustration_model_path(model_scale, q)
-    if not model_path:
-      model_type = "manga"
-  if not model_path:
-    height_key = _pick_height(h, model_scale, model_type)
-    model_path = _get_model_path(height_key, model_scale, model_type)
-  key = f"{model_path}::x{model_scale}::q={q}"
-  engine = _get_engine(key, model_path, model_scale, q)
+def _activation_bytes_per_px(engine) -> int:
+  # Rough RRDB activation estimate per input pixel; errs low since OOM still falls back.
+  elem = 2 if getattr(engine, "half", False) else 4
+  scale = int(getattr(engine, "scale", 4) or 4)
+  return elem * 64 * (4 + scale * scale)
+
+def _auto_tile_size(engine, h: int, w: int) -> int:
+  # 0 when the whole page should fit in free VRAM, else the largest square tile that should.
+  free = _cuda_free_bytes()
+  if not free:
+    return 0
+  per_px = _activation_bytes_per_px(engine)
+  budget = free * 0.7
+  if h * w * per_px <= budget:
+    return 0
+  tile = int((budget / per_px) ** 0.5)
+  return max(128, min(tile, 1024))
+
+def _tile_batch_size(engine, th: int, tw: int) -> int:
+  free = _cuda_free_bytes()
+  if not free:
+    return 1
+  n = int(free * 0.7 // (_activation_bytes_per_px(engine) * th * tw))
+  return max(1, min(n, 8))
+
+def _tile_process(self) -> None:
+  # Drop-in for RealESRGANer.tile_process (bound per engine in _load_engine). Same tile geometry
+  # and output, but tiles with the same padded shape go through the model as one batch, and
+  # errors propagate: upstream prints them and pastes a stale tile, which also hid OOMs from
+  # the retry in _enhance_single.
+  import torch
+  _, channel, height, width = self.img.shape
+  scale = int(self.scale)
+  tile = int(self.tile_size)
+  pad = int(self.tile_pad)
+  self.output = self.img.new_zeros((1, channel, height * scale, width * scale))
+
+  groups: dict[tuple[int, int], list[tuple[int, ...]]] = {}
+  for y0 in range(0, height, tile):
+    y1 = min(y0 + tile, height)
+    py0, py1 = max(y0 - pad, 0), min(y1 + pad, height)
+    for x0 in range(0, width, tile):
+      x1 = min(x0 + tile, width)
+      px0, px1 = max(x0 - pad, 0), min(x1 + pad, width)
+      groups.setdefault((py1 - py0, px1 - px0), []).append((x0, x1, y0, y1, px0, px1, py0, py1))
+
+  for (th, tw), items in groups.items():
+    n = _tile_batch_size(self, th, tw)
+    for i in range(0, len(items), n):
+      chunk = items[i:i + n]
+      tiles = [self.img[:, :, py0:py1, px0:px1] for (_, _, _, _, px0, px1, py0, py1) in chunk]
+      x = tiles[0] if len(tiles) == 1 else torch.cat(tiles)
+      with torch.inference_mode():
+        y = self.model(x)
+      for j, (x0, x1, y0, y1, px0, px1, py0, py1) in enumerate(chunk):
+        oy, ox = (y0 - py0) * scale, (x0 - px0) * scale
+        self.output[:, :, y0 * scale:y1 * scale, x0 * scale:x1 * scale] = \
+          y[j:j + 1, :, oy:oy + (y1 - y0) * scale, ox:ox + (x1 - x0) * scale]
+
+def _enhance_call(engine, in_img: np.ndarray) -> np.ndarray:
+  # Native model scale; _run_engine resizes to the requested outscale after releasing the GPU.
+  if getattr(engine, "pre_pad", 0):
+    out, _ = engine.enhance(in_img)
+    return out
+  return _forward_batch(engine, [in_img])[0]
 
-  import numpy as np
-  in_img = np.array(img)[:, :, ::-1]  # RGB -> BGR
+def _enhance_single(engine, in_img: np.ndarray, q: str) -> np.ndarray:
+  # Caller holds _gpu_lock: engines are shared across requests and tile_size is mutated here.
+  h, w = in_img.shape[:2]
+  prof = QUALITY_PROFILES.get(q, QUALITY_PROFILES["balanced"])
   prev_tile = getattr(engine, "tile_size", 0)
-  engine.tile_size = QUALITY_PROFILES.get(q, QUALITY_PROFILES["balanced"]).get("tile", 0) or 0
+  engine.tile_size = prof.get("tile", 0) or _auto_tile_size(engine, h, w)
+  engine.tile_pad = prof.get("tile_pad", engine.tile_pad)
   try:
-    out, _ = engine.enhance(in_img, outscale=outscale)
+    out = _enhance_call(engine, in_img)
   except Exception as e:
     msg = str(e).lower()
     if "out of memory" in msg or "cuda out of memory" in msg:
       # Retry once with tiling (common on huge pages).
       try:
-        _log("CUDA OOM; retrying with tile_size=512")
-        engine.tile_size = 512
-        out, _ = engine.enhance(in_img, outscale=outscale)
+        try:
+          import torch
+          torch.cuda.empty_cache()
+        except Exception:
+          pass
+        tile = _auto_tile_size(engine, h, w) or 512
+        if engine.tile_size and tile >= engine.tile_size:
+          tile = max(128, engine.tile_size // 2)
+        _log(f"CUDA OOM; retrying with tile_size={tile}")
+        engine.tile_size = tile
+        out = _enhance_call(engine, in_img)
       except Exception:
         raise
+    elif getattr(engine, "_mu_eager_model", None) is not None:
+      _log(f"compiled model failed; reverting to eager: {e}")
+      engine.model = engine._mu_eager_model
+      engine._mu_eager_model = None
+      out = _enhance_call(engine, in_img)
     else:
       raise
   finally:
@@ -1057,22 +1609,221 @@ def enhance_bytes(img_bytes: bytes, outscale: int, quality: str | None, out_form
       engine.tile_size = prev_tile
     except Exception:
       pass
+  return out
+
+def _forward_batch(engine, imgs: list[np.ndarray]) -> list[np.ndarray]:
+  # Same math as RealESRGANer.enhance(outscale=None) for 8-bit 3-channel input without
+  # pre_pad, but for N same-shaped BGR images in a single forward pass, and with the uint8
+  # conversion done on the device: enhance() pulls the output back as float32, 4x the bytes.
+  # A single image may be tiled (engine.tile_size, set by _enhance_single).
+  import numpy as np
+  import torch
+  import torch.nn.functional as F
+  h, w = imgs[0].shape[:2]
+  scale = int(engine.scale)
+  # Upload as uint8 (1/4 the bytes of float32) and normalize on the device.
+  x = torch.from_numpy(np.stack(imgs)).to(engine.device, non_blocking=True)
+  x = x.permute(0, 3, 1, 2).flip(1)  # NHWC BGR -> NCHW RGB
+  x = x.half() if engine.half else x.float()
+  x.div_(255.0)
+  mod = 2 if scale == 2 else 4 if scale == 1 else 0
+  pad_h = (mod - h % mod) % mod if mod else 0
+  pad_w = (mod - w % mod) % mod if mod else 0
+  if pad_h or pad_w:
+    x = F.pad(x, (0, pad_w, 0, pad_h), "reflect")
+  with torch.inference_mode():
+    if engine.tile_size and len(imgs) == 1:
+      engine.img = x
+      try:
+        engine.tile_process()
+        y = engine.output
+      finally:
+        engine.img = engine.output = None
+    else:
+      y = engine.model(x)
+    # Quantize on the device so only uint8 crosses back over PCIe. This stays inside
+    # inference_mode: y is an inference tensor, and for fp32 engines .float() returns it as is,
+    # so the in-place ops below would raise outside the mode.
+    y = y[:, :, :h * scale, :w * scale].float().clamp_(0, 1).mul_(255.0).round_().to(torch.uint8)
+  y = y.flip(1).permute(0, 2, 3, 1).contiguous().cpu().numpy()  # back to NHWC BGR
+  return list(y)
+
+def _resize_to_outscale(engine, out: np.ndarray, in_shape: tuple, outscale: int) -> np.ndarray:
+  # Same Lanczos resize RealESRGANer.enhance applies when outscale != the model scale.
+  if outscale == int(engine.scale):
+    return out
+  import cv2
+  h, w = in_shape[:2]
+  return cv2.resize(out, (int(w * outscale), int(h * outscale)), interpolation=cv2.INTER_LANCZOS4)
+
+class _BatchSlot:
+  __slots__ = ("img", "out", "err", "done", "lead", "event")
+
+  def __init__(self, img: np.ndarray):
+    self.img = img
+    self.out = None
+    self.err = None
+    self.done = False
+    # Set when the slot is done, or when the device is handed to this slot's thread (lead).
+    self.lead = False
+    self.event = threading.Event()
+
+_batch_lock = threading.Lock()
+_batch_pending: dict[tuple, list[_BatchSlot]] = {}
+_gpu_busy = False  # guarded by _batch_lock; True while some thread leads the device
+
+def _batch_max() -> int:
+  try:
+    return max(1, min(int(CFG.get("enhance_batch_max", 4)), 16))
+  except Exception:
+    return 1
+
+def _can_batch(engine, img: np.ndarray, n: int, q: str) -> bool:
+  if QUALITY_PROFILES.get(q, QUALITY_PROFILES["balanced"]).get("tile", 0):
+    return False
+  if getattr(engine, "pre_pad", 0):
+    return False
+  h, w = img.shape[:2]
+  # The whole batch has to fit untiled.
+  return _auto_tile_size(engine, h, w * n) == 0
+
+def _run_group(engine, group: list[_BatchSlot], q: str) -> None:
+  import torch
+  # inference_mode also skips version-counter/view tracking that enhance()'s no_grad keeps.
+  with torch.inference_mode():
+    _run_group_inner(engine, group, q)
+
+def _run_group_inner(engine, group: list[_BatchSlot], q: str) -> None:
+  if len(group) > 1 and _can_batch(engine, group[0].img, len(group), q):
+    try:
+      outs = _forward_batch(engine, [slot.img for slot in group])
+      for slot, out in zip(group, outs):
+        slot.out = out
+        slot.done = True
+      return
+    except Exception as e:
+      _log(f"batched forward failed; running {len(group)} images individually: {e}")
+  for slot in group:
+    try:
+      slot.out = _enhance_single(engine, slot.img, q)
+    except Exception as e:
+      slot.err = e
+    slot.done = True
+
+def _run_engine(engine, in_img: np.ndarray, outscale: int, q: str) -> np.ndarray:
+  # Only the GPU step is serialized: downloads, decode and encode of other requests keep
+  # running on their own handler threads while this one holds the device.
+  # Micro-batching by flat combining: requests that queue up behind the GPU for the same
+  # engine + page shape are all run by whichever thread leads the device next. No timers, so a
+  # lone request goes straight through; batches only form while the GPU is already busy.
+  # Waiters block on their slot's event, which fires as soon as their batch is finished (or
+  # when the device is handed to them), not when the device next frees up.
+  # Outputs come back at the model's native scale, so requests that only differ in outscale
+  # still share a batch; the (CPU) resize to outscale happens after the GPU is released.
+  global _gpu_busy
+  bkey = (engine, in_img.shape, q)
+  slot = _BatchSlot(in_img)
+  with _batch_lock:
+    _batch_pending.setdefault(bkey, []).append(slot)
+    if not _gpu_busy:
+      _gpu_busy = True
+      slot.lead = True
+  if not slot.lead:
+    slot.event.wait()
+  if not slot.done:
+    # This thread leads: run batches for its own key until its slot is finished, then pass
+    # the device to the oldest pending request (or release it).
+    try:
+      with _gpu_lock:
+        while not slot.done:
+          with _batch_lock:
+            group = _batch_pending.pop(bkey, [])
+            max_n = _batch_max()
+            if len(group) > max_n:
+              _batch_pending[bkey] = group[max_n:]
+              group = group[:max_n]
+          try:
+            _run_group(engine, group, q)
+          finally:
+            # Whatever happened, every slot of a drained batch is finished and its thread woken.
+            for other in group:
+              if not other.done:
+                other.err = other.err or RuntimeError("batched inference aborted")
+                other.done = True
+              other.event.set()
+    finally:
+      with _batch_lock:
+        nxt = None
+        for pending in _batch_pending.values():
+          if pending:
+            nxt = pending[0]
+            break
+        if nxt is None:
+          _gpu_busy = False
+        else:
+          nxt.lead = True
+          nxt.event.set()
+  if slot.err is not None:
+    raise slot.err
+  return _resize_to_outscale(engine, slot.out, in_img.shape, outscale)
+
+def enhance_bytes(img_bytes: bytes, outscale: int, quality: str | None, out_format: str | None = None) -> tuple[bytes, str, str]:
+  _prewarm_engines()
+  in_img = _decode_bgr(img_bytes)
+  h, w = in_img.shape[:2]
+
+  q = _normalize_quality(quality)
+  outscale = _normalize_outscale(outscale)
+  fmt = _normalize_output_format(out_format)
+
+  # Choose model by grayscale detection + input height. In a manga-only install the result
+  # can't change the model, and PNG output doesn't use it, so skip detection there
+  # (None = unknown; treated as colour below).
+  is_gray = _detect_grayscale(in_img) if (_has_illustration_models or fmt == "webp") else None
+  model_type = _choose_model_type(bool(is_gray))
+  model_path = None
+  height_key = None
+  model_scale = _model_scale_for_outscale(outscale, model_type, q)
+  if model_type == "illustration":
+    model_path = _get_illustration_model_path(model_scale, q)
+    if not model_path:
+      model_type = "manga"
+  if not model_path:
+    height_key = _pick_height(h, model_scale, model_type)
+    model_path = _get_model_path(height_key, model_scale, model_type)
+  key = _engine_key(model_path, model_scale, q)
+  engine = _get_engine(key, model_path, model_scale, q)
+
+  out = _run_engine(engine, in_img, outscale, q)
 
-  out_rgb = out[:, :, ::-1]
   resid_tag = ""
   if _should_apply_residual(model_path):
-    out_rgb = _apply_residual_add(out_rgb, img, CFG.get("residual_add_strength", 1.0))
+    out = _apply_residual_add(out, in_img, CFG.get("residual_add_strength", 1.0))
     resid_tag = " resid"
-  out_img = Image.fromarray(out_rgb)
-
-  out_bytes, ctype = _encode_output(out_img, fmt, is_gray)
+  out_bytes, ctype = _encode_output(out, fmt, bool(is_gray))
   if height_key:
     label = f"{model_type}:{height_key}p x{outscale} {q}{resid_tag}"
   else:
     label = f"{model_type}:{q} x{outscale}{resid_tag}"
   return out_bytes, label, ctype
 
+def _parse_query(query: str) -> dict[str, str]:
+  # First value per key, like the old parse_qs(...)[0] lookups, without a list per key.
+  qs: dict[str, str] = {}
+  for k, v in urllib.parse.parse_qsl(query or ""):
+    qs.setdefault(k, v)
+  return qs
+
 class Handler(BaseHTTPRequestHandler):
+  # Keep-alive: the tray polls /status every ~second and the extension fetches pages in bursts;
+  # HTTP/1.1 lets both reuse one connection instead of a TCP setup/teardown per request. Idle
+  # connections are dropped after `timeout` seconds so they don't pin a handler thread.
+  protocol_version = "HTTP/1.1"
+  timeout = 30
+  # Responses go out as one write (see _send); with keep-alive, Nagle would otherwise hold a
+  # response's tail back waiting on the client's delayed ACK.
+  disable_nagle_algorithm = True
+
   def log_message(self, fmt, *args):
     try:
       if self.path.startswith("/health") or self.path.startswith("/status"):
@@ -1086,14 +1837,58 @@ class Handler(BaseHTTPRequestHandler):
 
   def _send(self, code: int, body: bytes, ctype: str="text/plain", extra_headers: dict|None=None):
     try:
-      self.send_response(code)
-      self.send_header("Content-Type", ctype)
-      self.send_header("Cache-Control", "no-store")
+      # Status line and headers are built here rather than through send_response()/
+      # send_header(), so small replies go out as one write (wfile is unbuffered; end_headers()
+      # + write() would be two syscalls, and two packets for tiny /health and /status replies).
+      self.log_request(code)
+      phrase = self.responses.get(code, ("",))[0]
+      lines = [
+        f"{self.protocol_version} {code} {phrase}",
+        f"Server: {self.version_string()}",
+        f"Date: {self.date_time_string()}",
+        f"Content-Type: {ctype}",
+        f"Content-Length: {len(body)}",
+        "Cache-Control: no-store",
+      ]
       if extra_headers:
         for k,v in extra_headers.items():
-          self.send_header(k, v)
+          lines.append(f"{k}: {v}")
+      if self.close_connection:
+        lines.append("Connection: close")
+      head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1", "strict")
+      if len(body) <= 256 * 1024:
+        self.wfile.write(head + body)
+      else:
+        self.wfile.write(head)
+        self.wfile.write(body)
+    except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
+      self.close_connection = True
+      return
+    except OSError as e:
+      self.close_connection = True
+      if getattr(e, "winerror", None) in (10053, 10054) or e.errno in (32, 104):
+        return
+      raise
+
+  def _stream_events(self):
+    # Server-sent events: push the status payload when the number of active enhances changes
+    # (and every EVENTS_HEARTBEAT_SEC so dead clients are noticed), instead of clients polling
+    # /status. Holds this connection's thread until the client goes away.
+    self.close_connection = True
+    try:
+      self.send_response(200)
+      self.send_header("Content-Type", "text/event-stream")
+      self.send_header("Cache-Control", "no-store")
+      self.send_header("Connection", "close")
       self.end_headers()
-      self.wfile.write(body)
+      self.wfile.write(b"retry: 2000\n\n")
+      seen = -1
+      while True:
+        with _state_cond:
+          if _state_version == seen:
+            _state_cond.wait(EVENTS_HEARTBEAT_SEC)
+          seen = _state_version
+        self.wfile.write(b"data: " + json.dumps(_status_payload()).encode("utf-8") + b"\n\n")
     except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
       return
     except OSError as e:
@@ -1101,8 +1896,76 @@ class Handler(BaseHTTPRequestHandler):
         return
       raise
 
+  def _read_body(self, length: int, hasher=None) -> bytearray:
+    # Read straight into one preallocated buffer (rfile.read(n) joins chunk copies), hashing each
+    # chunk as it lands so there's no second pass over the body.
+    buf = bytearray(length)
+    got = 0
+    with memoryview(buf) as view:
+      while got < length:
+        n = self.rfile.readinto(view[got:got + (1 << 20)])
+        if not n:
+          break
+        if hasher is not None:
+          hasher.update(view[got:got + n])
+        got += n
+    if got < length:
+      del buf[got:]
+    return buf
+
+  def _send_cached(self, path: str, ctype: str) -> bool:
+    data = _mem_cache_get(path)
+    if data is not None:
+      _disk_index_touch(path)
+      self._send(200, data, ctype, {"X-MU-Model":"cache"})
+      return True
+    if not self._send_file(200, path, ctype, {"X-MU-Model":"cache"}):
+      return False
+    _disk_index_touch(path)
+    return True
+
+  def _send_file(self, code: int, path: str, ctype: str, extra_headers: dict|None=None) -> bool:
+    # Cache hits: let the kernel copy file -> socket instead of reading it into a bytes object.
+    # Returns False if the file isn't there (nothing has been sent yet in that case).
+    try:
+      f = open(path, "rb")
+    except OSError:
+      return False
+    with f:
+      try:
+        # Refresh mtime so the size-based cleanup evicts least-recently-used entries.
+        os.utime(path)
+      except OSError:
+        pass
+      try:
+        size = os.fstat(f.fileno()).st_size
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(size))
+        self.send_header("Cache-Control", "no-store")
+        if extra_headers:
+          for k,v in extra_headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.connection.sendfile(f)
+      except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
+        self.close_connection = True
+      except OSError as e:
+        self.close_connection = True
+        if getattr(e, "winerror", None) in (10053, 10054) or e.errno in (32, 104):
+          pass
+        else:
+          raise
+    return True
+
   def do_GET(self):
     try:
+      # Poll endpoints first, before any URL parsing.
+      if self.path == "/health":
+        return self._send(200, b"ok")
+      if self.path == "/status":
+        body = json.dumps(_status_payload()).encode("utf-8")
+        return self._send(200, body, "application/json")
       parsed = urllib.parse.urlparse(self.path)
       if parsed.path == "/telemetry/recent":
         items = _read_recent_telemetry(200)
@@ -1113,30 +1976,31 @@ class Handler(BaseHTTPRequestHandler):
       if parsed.path == "/status":
         body = json.dumps(_status_payload()).encode("utf-8")
         return self._send(200, body, "application/json")
+      if parsed.path == "/events":
+        return self._stream_events()
       if parsed.path != "/enhance":
         return self._send(404, b"not found")
       with _enhance_activity():
         _touch_enhance()
 
-        qs = urllib.parse.parse_qs(parsed.query or "")
-        url = (qs.get("url") or [""])[0]
-        outscale = int((qs.get("scale") or [CFG.get("default_scale", 2)])[0])
+        qs = _parse_query(parsed.query)
+        url = qs.get("url", "")
+        outscale = int(qs.get("scale") or CFG.get("default_scale", 2))
         outscale = _normalize_outscale(outscale)
-        quality = (qs.get("quality") or [CFG.get("default_quality", "balanced")])[0]
-        out_fmt = _normalize_output_format((qs.get("format") or qs.get("fmt") or [None])[0])
+        quality = qs.get("quality") or CFG.get("default_quality", "balanced")
+        out_fmt = _normalize_output_format(qs.get("format") or qs.get("fmt"))
 
         if not url:
           return self._send(400, b"missing url")
 
-        # Simple disk cache keyed by url+scale+quality+format
+        # Simple disk cache keyed by url+scale+quality+format. Stable across restarts (unlike hash()).
         _cleanup_cache_if_needed()
         cache_ext = _cache_ext_for_format(out_fmt)
-        cache_key = str(abs(hash(f"v{CACHE_VERSION}::{url}::{outscale}::{quality}::{out_fmt}")))
-        cache_path = os.path.join(CACHE_DIR, f"{cache_key}.{cache_ext}")
-        if os.path.exists(cache_path):
-          with open(cache_path, "rb") as f:
-            ctype = "image/webp" if cache_ext == "webp" else "image/png"
-            return self._send(200, f.read(), ctype, {"X-MU-Model":"cache"})
+        cache_key = hashlib.blake2b(f"v{CACHE_VERSION}::{url}::{outscale}::{quality}::{out_fmt}".encode("utf-8"), digest_size=16).hexdigest()
+        cache_path = _cache_file_path(cache_key, cache_ext)
+        ctype = "image/webp" if cache_ext == "webp" else "image/png"
+        if self._send_cached(cache_path, ctype):
+          return
 
         leader, evt = _dedupe_cache_begin(cache_path)
         if not leader and evt is not None:
@@ -1146,44 +2010,57 @@ class Handler(BaseHTTPRequestHandler):
             evt.wait(timeout=90)
           except Exception:
             pass
-          if os.path.exists(cache_path):
-            with open(cache_path, "rb") as f:
-              ctype = "image/webp" if cache_ext == "webp" else "image/png"
-              return self._send(200, f.read(), ctype, {"X-MU-Model":"cache"})
+          if self._send_cached(cache_path, ctype):
+            return
           # If it failed, fall through and attempt ourselves.
           leader, evt = (True, evt)
 
         # Download
+        handed_off = False
         try:
-          r = requests.get(url, timeout=20, headers={"User-Agent":"MangaUpscalerHost/1.0"})
-          r.raise_for_status()
-          src_bytes = r.content
+          with _http.get(url, timeout=20, stream=True) as r:
+            r.raise_for_status()
+            hasher = hashlib.blake2b(digest_size=20)
+            src_bytes = _read_response(r, hasher)
+            src_ctype = r.headers.get("content-type","application/octet-stream").split(";")[0]
+
+          # Same image under another URL (CDN mirrors, cache-busting query strings) or already
+          # enhanced through POST: reuse that output and file it under this URL too.
+          content_key = _content_cache_key(hasher, outscale, quality, out_fmt)
+          cached = _read_cached(_cache_file_path(content_key, cache_ext))
+          if cached is not None:
+            handed_off = _write_cache_async(cache_path, cached, evt)
+            return self._send(200, cached, ctype, {"X-MU-Model":"cache"})
 
           # Try enhance, fallback to passthrough if missing deps/models
           try:
             out_bytes, model_name, ctype = enhance_bytes(src_bytes, outscale, quality, out_fmt)
-            with open(cache_path, "wb") as f:
-              f.write(out_bytes)
+            handed_off = _write_cache_async(cache_path, out_bytes, evt)
             return self._send(200, out_bytes, ctype, {"X-MU-Model": model_name})
           except Exception as e:
             # passthrough original image
             err = (str(e) or e.__class__.__name__).encode("utf-8", "ignore")[:400]
             _log(f"enhance failed (GET): {err.decode('utf-8','ignore')}")
-            ctype = r.headers.get("content-type","application/octet-stream").split(";")[0]
-            return self._send(200, src_bytes, ctype, {"X-MU-Host-Error": err.decode("utf-8","ignore")})
+            return self._send(200, src_bytes, src_ctype, {"X-MU-Host-Error": err.decode("utf-8","ignore")})
         finally:
-          _dedupe_cache_end(cache_path, evt)
+          if not handed_off:
+            _dedupe_cache_end(cache_path, evt)
 
     except Exception as e:
       tb = traceback.format_exc()
       _log(tb)
+      # The failure may have left a partial response on the wire.
+      self.close_connection = True
       self._send(500, tb.encode("utf-8","ignore")[:8000])
 
   def do_POST(self):
+    # Not every POST route drains its body (403s, /shutdown), and leftover bytes would be parsed
+    # as the next request; POSTs are one-shot.
+    self.close_connection = True
     try:
       parsed = urllib.parse.urlparse(self.path)
       if parsed.path == "/telemetry":
-        if self.client_address[0] not in ("127.0.0.1", "::1"):
+        if self.client_address[0] not in _LOCAL_ADDRS:
           return self._send(403, b"forbidden")
         length = int(self.headers.get("Content-Length", "0"))
         if length <= 0:
@@ -1195,7 +2072,7 @@ class Handler(BaseHTTPRequestHandler):
         _append_telemetry(payload if isinstance(payload, dict) else {"payload": payload})
         return self._send(200, b"ok")
       if parsed.path == "/shutdown":
-        if self.client_address[0] not in ("127.0.0.1", "::1"):
+        if self.client_address[0] not in _LOCAL_ADDRS:
           return self._send(403, b"forbidden")
         threading.Thread(target=self.server.shutdown, daemon=True).start()
         return self._send(200, b"ok")
@@ -1245,28 +2122,28 @@ class Handler(BaseHTTPRequestHandler):
       with _enhance_activity():
         _touch_enhance()
 
-        qs = urllib.parse.parse_qs(parsed.query or "")
-        outscale = int((qs.get("scale") or [CFG.get("default_scale", 2)])[0])
+        qs = _parse_query(parsed.query)
+        outscale = int(qs.get("scale") or CFG.get("default_scale", 2))
         outscale = _normalize_outscale(outscale)
-        quality = (qs.get("quality") or [CFG.get("default_quality", "balanced")])[0]
-        out_fmt = _normalize_output_format((qs.get("format") or qs.get("fmt") or [None])[0])
+        quality = qs.get("quality") or CFG.get("default_quality", "balanced")
+        out_fmt = _normalize_output_format(qs.get("format") or qs.get("fmt"))
 
         length = int(self.headers.get("Content-Length", "0"))
         if length <= 0:
           return self._send(400, b"missing body")
-        src_bytes = self.rfile.read(length)
+        # Cache by content hash + scale + quality + format; the hash is fed while the body arrives.
+        hasher = hashlib.blake2b(digest_size=20)
+        src_bytes = self._read_body(length, hasher)
         if not src_bytes:
           return self._send(400, b"empty body")
 
-        # Cache by content hash + scale + quality + format
         _cleanup_cache_if_needed()
         cache_ext = _cache_ext_for_format(out_fmt)
-        h = hashlib.sha1(src_bytes + f"::{outscale}::{quality}::{out_fmt}::v{CACHE_VERSION}".encode("utf-8")).hexdigest()
-        cache_path = os.path.join(CACHE_DIR, f"{h}.{cache_ext}")
-        if os.path.exists(cache_path):
-          with open(cache_path, "rb") as f:
-            ctype = "image/webp" if cache_ext == "webp" else "image/png"
-            return self._send(200, f.read(), ctype, {"X-MU-Model":"cache"})
+        h = _content_cache_key(hasher, outscale, quality, out_fmt)
+        cache_path = _cache_file_path(h, cache_ext)
+        ctype = "image/webp" if cache_ext == "webp" else "image/png"
+        if self._send_cached(cache_path, ctype):
+          return
 
         leader, evt = _dedupe_cache_begin(cache_path)
         if not leader and evt is not None:
@@ -1274,30 +2151,40 @@ class Handler(BaseHTTPRequestHandler):
             evt.wait(timeout=90)
           except Exception:
             pass
-          if os.path.exists(cache_path):
-            with open(cache_path, "rb") as f:
-              ctype = "image/webp" if cache_ext == "webp" else "image/png"
-              return self._send(200, f.read(), ctype, {"X-MU-Model":"cache"})
+          if self._send_cached(cache_path, ctype):
+            return
           leader, evt = (True, evt)
 
+        handed_off = False
         try:
           out_bytes, model_name, ctype = enhance_bytes(src_bytes, outscale, quality, out_fmt)
-          with open(cache_path, "wb") as f:
-            f.write(out_bytes)
+          handed_off = _write_cache_async(cache_path, out_bytes, evt)
           return self._send(200, out_bytes, ctype, {"X-MU-Model": model_name})
         except Exception as e:
           err = (str(e) or e.__class__.__name__).encode("utf-8", "ignore")[:400]
           _log(f"enhance failed (POST): {err.decode('utf-8','ignore')}")
           return self._send(200, src_bytes, "application/octet-stream", {"X-MU-Host-Error": err.decode("utf-8","ignore")})
         finally:
-          _dedupe_cache_end(cache_path, evt)
+          if not handed_off:
+            _dedupe_cache_end(cache_path, evt)
     except Exception:
       tb = traceback.format_exc()
       _log(tb)
+      # The failure may have left a partial response on the wire.
+      self.close_connection = True
       self._send(500, tb.encode("utf-8","ignore")[:8000])
 
+class HostHTTPServer(ThreadingHTTPServer):
+  # Browsers prefetch a burst of panels at once; the default listen backlog of 5 makes the
+  # extras wait on SYN retries before a handler thread even sees them.
+  request_queue_size = 64
+  daemon_threads = True
+  # Thread per connection (ThreadingMixIn's default): keep-alive connections, /events streams
+  # and dedupe waits can each hold a thread for a long time, and a fixed pool would let them
+  # starve the tray's short /health and /status probes.
+
 def create_httpd():
-  return ThreadingHTTPServer((HOST, PORT), Handler)
+  return HostHTTPServer((HOST, PORT), Handler)
 
 def start_http_server():
   global _last_enhance_ts, _idle_stop
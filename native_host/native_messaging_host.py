@@ -2,7 +2,6 @@
 from __future__ import annotations
 import json
 import os
-import struct
 import subprocess
 import sys
 import time
@@ -22,20 +21,23 @@ _tray_proc = None
 
 
 def _read_message():
+  # Native messaging framing: 4-byte little-endian length, then UTF-8 JSON.
   raw_len = sys.stdin.buffer.read(4)
-  if not raw_len:
+  if len(raw_len) < 4:
     return None
-  msg_len = struct.unpack("<I", raw_len)[0]
-  data = sys.stdin.buffer.read(msg_len)
-  if not data:
+  msg_len = int.from_bytes(raw_len, "little")
+  if msg_len == 0:
     return None
-  return json.loads(data.decode("utf-8"))
+  data = bytearray(msg_len)
+  if sys.stdin.buffer.readinto(data) < msg_len:
+    return None
+  return json.loads(data)
 
 
 def _send_message(obj: dict):
   data = json.dumps(obj).encode("utf-8")
-  sys.stdout.buffer.write(struct.pack("<I", len(data)))
-  sys.stdout.buffer.write(data)
+  # One write for header + body so the frame goes out in a single pipe write.
+  sys.stdout.buffer.write(len(data).to_bytes(4, "little") + data)
   sys.stdout.buffer.flush()
 
 
@@ -2,10 +2,13 @@
 from __future__ import annotations
 import json
 import os
+import shutil
+import socket
 import subprocess
 import sys
 import threading
 import time
+import http.client
 import urllib.request
 import urllib.error
 import ctypes
@@ -39,9 +42,16 @@ def _ensure_single_instance_or_exit():
     return
   try:
     name = "Global\\MangaUpscalerHostTray"
-    h = ctypes.windll.kernel32.CreateMutexW(None, True, name)
+    # Own WinDLL with use_last_error: ctypes captures the error code right after the call, where a
+    # separate GetLastError() call may see a value clobbered in between. Typed so the HANDLE
+    # isn't truncated to a C int.
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    create_mutex = kernel32.CreateMutexW
+    create_mutex.argtypes = (ctypes.c_void_p, ctypes.c_int, ctypes.c_wchar_p)
+    create_mutex.restype = ctypes.c_void_p
+    h = create_mutex(None, True, name)
     # ERROR_ALREADY_EXISTS = 183
-    if ctypes.windll.kernel32.GetLastError() == 183:
+    if ctypes.get_last_error() == 183:
       raise SystemExit(0)
     global _tray_mutex
     _tray_mutex = h
@@ -68,6 +78,17 @@ PORT = 48159
 HEALTH_URL = f"http://{HOST}:{PORT}/health"
 STATUS_URL = f"http://{HOST}:{PORT}/status"
 SHUTDOWN_URL = f"http://{HOST}:{PORT}/shutdown"
+CLEAR_CACHE_URL = f"http://{HOST}:{PORT}/cache/clear"
+# The host sends at least a heartbeat every 15s on /events; give up on the stream well after that.
+EVENTS_READ_TIMEOUT = 40
+# How often the /events reader wakes up to check for quit or a requested refresh.
+EVENTS_WAKE_SEC = 0.5
+# How long a state reported by the status loop is trusted (covers the /events heartbeat and the
+# longest poll backoff).
+STATUS_KNOWN_SEC = 20
+# After start/stop the status loop keeps polling at its fastest rate for this long, since the host
+# takes a few seconds to come up or go down.
+STATUS_FAST_SEC = 5
 MODELS_DIR = os.path.join(ROOT, "models")
 CACHE_DIR = os.path.join(ROOT, "cache")
 CONFIG_PATH = os.path.join(ROOT, "config.json")
@@ -114,19 +135,48 @@ def _launch_host(log_file):
     return None
 
 
+# One keep-alive connection per polling thread: the status loop hits the host about once a
+# second for the life of the tray, so reusing the socket avoids a TCP setup/teardown per poll.
+_probe = threading.local()
+
+def _probe_get(path: str, timeout: float) -> tuple[int, bytes] | None:
+  for _ in range(2):
+    conn = getattr(_probe, "conn", None)
+    reused = conn is not None
+    if not reused:
+      conn = http.client.HTTPConnection(HOST, PORT, timeout=timeout)
+    elif conn.sock is not None:
+      conn.sock.settimeout(timeout)
+    try:
+      conn.request("GET", path)
+      resp = conn.getresponse()
+      body = resp.read()
+      if resp.will_close:
+        conn.close()
+        conn = None
+      _probe.conn = conn
+      return resp.status, body
+    except Exception:
+      try:
+        conn.close()
+      except Exception:
+        pass
+      _probe.conn = None
+      # A reused connection may have been closed by the host while idle; retry on a fresh one.
+      if not reused:
+        return None
+  return None
+
 def _ping_host() -> bool:
-  try:
-    with urllib.request.urlopen(HEALTH_URL, timeout=0.6) as resp:
-      return resp.status == 200
-  except Exception:
-    return False
+  res = _probe_get("/health", 0.6)
+  return bool(res and res[0] == 200)
 
 def _fetch_status() -> dict | None:
+  res = _probe_get("/status", 0.8)
+  if not res or res[0] != 200:
+    return None
   try:
-    with urllib.request.urlopen(STATUS_URL, timeout=0.8) as resp:
-      if resp.status != 200:
-        return None
-      return json.loads(resp.read().decode("utf-8", "ignore") or "{}")
+    return json.loads(res[1] or b"{}")
   except Exception:
     return None
 
@@ -135,18 +185,38 @@ class HostController:
   def __init__(self):
     self.proc = None
     self.log_file = None
+    # Set on start/stop/quit so the status loop re-polls right away instead of after its backoff.
+    self.status_wake = threading.Event()
+    # time.monotonic() until which the status loop skips its backoff (see STATUS_FAST_SEC).
+    self.fast_poll_until = 0.0
+    self.quitting = False
+    # Last state seen by the status loop: (running, time.monotonic()).
+    self.known_running: tuple[bool, float] | None = None
+
+  def note_running(self, running: bool):
+    self.known_running = (running, time.monotonic())
 
   def is_running(self) -> bool:
-    return _ping_host()
+    # The menu's enabled= callbacks call this on every redraw; answer from the status loop
+    # (event push or recent poll) when it recently saw the host up. A cached "stopped" is not
+    # trusted: the host can be started by the extension at any time, and probing a closed port
+    # fails fast.
+    known = self.known_running
+    if known is not None and known[0] and (time.monotonic() - known[1]) < STATUS_KNOWN_SEC:
+      return True
+    running = _ping_host()
+    self.note_running(running)
+    return running
 
   def start(self):
-    if self.is_running():
+    if _ping_host():
       return
     try:
       self.log_file = open(LOG_PATH, "a", encoding="utf-8")
     except Exception:
       self.log_file = None
     self.proc = _launch_host(self.log_file)
+    self._state_changing()
 
   def stop(self):
     try:
@@ -169,21 +239,44 @@ class HostController:
       except Exception:
         pass
       self.log_file = None
+    self._state_changing()
+
+  def _state_changing(self):
+    # Whatever the status loop saw before start/stop is stale now; re-poll right away and keep
+    # polling fast until the host has settled.
+    self.known_running = None
+    self.fast_poll_until = time.monotonic() + STATUS_FAST_SEC
+    self.status_wake.set()
 
   def clear_cache(self):
+    # A running host also keeps cache entries (and its index of the disk cache) in memory; let it
+    # do the clearing so those don't go stale.
+    try:
+      req = urllib.request.Request(CLEAR_CACHE_URL, data=b"", method="POST")
+      with urllib.request.urlopen(req, timeout=10) as resp:
+        if resp.status == 200:
+          return
+    except Exception:
+      pass
     if not os.path.isdir(CACHE_DIR):
       return
-    wrapped = os.path.abspath(os.path.join(CACHE_DIR, "wrapped_models"))
-    for root, dirs, files in os.walk(CACHE_DIR):
-      if os.path.abspath(root) == wrapped:
+    # os.scandir entries carry their file type, so telling files from dirs costs no stat.
+    stack = [CACHE_DIR]
+    while stack:
+      try:
+        it = os.scandir(stack.pop())
+      except OSError:
         continue
-      if "wrapped_models" in dirs:
-        dirs.remove("wrapped_models")
-      for fn in files:
-        try:
-          os.remove(os.path.join(root, fn))
-        except Exception:
-          pass
+      with it:
+        for entry in it:
+          try:
+            if entry.is_dir(follow_symlinks=False):
+              if entry.name != "wrapped_models":
+                stack.append(entry.path)
+            else:
+              os.remove(entry.path)
+          except OSError:
+            pass
 
 
 def _load_icon() -> Image.Image:
@@ -194,17 +287,20 @@ def _load_icon() -> Image.Image:
   for path in candidates:
     if os.path.exists(path):
       try:
-        return Image.open(path)
+        # Decode once, up front, into the mode both tray icons use; Image.open alone is lazy and
+        # would leave the decode (and a mode conversion) to the first icon swap.
+        with Image.open(path) as src:
+          return src.convert("RGBA")
       except Exception:
         pass
-  img = Image.new("RGB", (64, 64), (24, 20, 30))
+  img = Image.new("RGBA", (64, 64), (24, 20, 30, 255))
   draw = ImageDraw.Draw(img)
   draw.ellipse((10, 10, 54, 54), fill=(255, 127, 200), outline=(250, 230, 240))
   return img
 
 def _make_busy_icon(base: Image.Image) -> Image.Image:
   try:
-    img = base.convert("RGBA").copy()
+    img = base.copy() if base.mode == "RGBA" else base.convert("RGBA")
   except Exception:
     img = Image.new("RGBA", (64, 64), (0, 0, 0, 0))
   w, h = img.size
@@ -233,21 +329,40 @@ def _open_file(path: str):
     pass
 
 def _load_config_allow_dat2() -> bool:
-  try:
-    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-      cfg = json.load(f)
-    return bool(cfg.get("allow_dat2", False))
-  except Exception:
-    return False
+  return bool(_load_config().get("allow_dat2", False))
+
+# ((st_mtime_ns, st_size), parsed config). The menu's "checked" callbacks read the config on
+# every redraw; only re-parse when the file has changed. Size is part of the key because an
+# edit on a coarse-timestamp filesystem can land within the same mtime tick.
+_config_cache: tuple[tuple[int, int], dict] | None = None
 
 def _load_config() -> dict:
+  global _config_cache
   try:
-    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-      return json.load(f) or {}
+    st = os.stat(CONFIG_PATH)
+    sig = (st.st_mtime_ns, st.st_size)
+    cached = _config_cache
+    if cached is None or cached[0] != sig:
+      with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+        cached = (sig, json.load(f) or {})
+      _config_cache = cached
+    # Callers update top-level keys and save; hand out a copy so the cache stays pristine.
+    return dict(cached[1])
   except Exception:
     return {}
 
 def _save_config(cfg: dict) -> bool:
+  global _config_cache
+  # Nothing to write if the file still holds exactly this config (e.g. the update flow
+  # re-recording the same last-seen timestamp); skips the rewrite and its mtime bump.
+  cached = _config_cache
+  if cached is not None and cached[1] == (cfg or {}):
+    try:
+      st = os.stat(CONFIG_PATH)
+      if cached[0] == (st.st_mtime_ns, st.st_size):
+        return True
+    except OSError:
+      pass
   try:
     os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
   except Exception:
@@ -257,6 +372,7 @@ def _save_config(cfg: dict) -> bool:
     with open(tmp, "w", encoding="utf-8") as f:
       json.dump(cfg or {}, f, ensure_ascii=False, indent=2)
     os.replace(tmp, CONFIG_PATH)
+    _config_cache = None
     return True
   except Exception:
     return False
@@ -272,49 +388,59 @@ def _parse_iso(s: str) -> datetime | None:
   except Exception:
     return None
 
-def _fetch_latest_installer_info() -> tuple[str, str] | None:
+# Last release JSON from UPDATE_API_URL. Reused outright for a short while (run_update_all asks
+# for the installer and the extension back to back) and revalidated with its ETag after that;
+# GitHub doesn't count 304s against the API rate limit.
+_release_cache: dict = {"etag": "", "data": None, "ts": 0.0}
+RELEASE_FRESH_SEC = 60
+
+def _fetch_release() -> dict | None:
+  cached = _release_cache.get("data")
+  if cached is not None and (time.time() - _release_cache["ts"]) < RELEASE_FRESH_SEC:
+    return cached
+  headers = {
+    "User-Agent": "MangaUpscalerHost",
+    "Accept": "application/vnd.github+json"
+  }
+  if cached is not None and _release_cache["etag"]:
+    headers["If-None-Match"] = _release_cache["etag"]
   try:
-    req = urllib.request.Request(
-      UPDATE_API_URL,
-      headers={
-        "User-Agent": "MangaUpscalerHost",
-        "Accept": "application/vnd.github+json"
-      }
-    )
+    req = urllib.request.Request(UPDATE_API_URL, headers=headers)
     with urllib.request.urlopen(req, timeout=8) as resp:
       if resp.status != 200:
         return None
-      data = json.loads(resp.read().decode("utf-8", "ignore") or "{}")
-    assets = data.get("assets") or []
-    for a in assets:
-      if str(a.get("name") or "") == INSTALLER_ASSET_NAME:
-        return (str(a.get("updated_at") or ""), str(a.get("browser_download_url") or ""))
-    # Fallback: if asset not found, use release updated_at + direct download URL.
-    return (str(data.get("published_at") or data.get("created_at") or data.get("updated_at") or ""), INSTALLER_FALLBACK_URL)
+      data = json.loads(resp.read() or b"{}")
+      etag = resp.headers.get("ETag") or ""
+  except urllib.error.HTTPError as e:
+    if e.code == 304 and cached is not None:
+      _release_cache["ts"] = time.time()
+      return cached
+    return None
   except Exception:
     return None
+  _release_cache.update({"etag": etag, "data": data, "ts": time.time()})
+  return data
 
-def _fetch_latest_extension_info() -> tuple[str, str] | None:
+def _release_asset_info(asset_name: str, fallback_url: str) -> tuple[str, str] | None:
   try:
-    req = urllib.request.Request(
-      UPDATE_API_URL,
-      headers={
-        "User-Agent": "MangaUpscalerHost",
-        "Accept": "application/vnd.github+json"
-      }
-    )
-    with urllib.request.urlopen(req, timeout=8) as resp:
-      if resp.status != 200:
-        return None
-      data = json.loads(resp.read().decode("utf-8", "ignore") or "{}")
+    data = _fetch_release()
+    if data is None:
+      return None
     assets = data.get("assets") or []
     for a in assets:
-      if str(a.get("name") or "") == EXTENSION_ASSET_NAME:
+      if str(a.get("name") or "") == asset_name:
         return (str(a.get("updated_at") or ""), str(a.get("browser_download_url") or ""))
-    return (str(data.get("published_at") or data.get("created_at") or data.get("updated_at") or ""), EXTENSION_FALLBACK_URL)
+    # Fallback: if asset not found, use release updated_at + direct download URL.
+    return (str(data.get("published_at") or data.get("created_at") or data.get("updated_at") or ""), fallback_url)
   except Exception:
     return None
 
+def _fetch_latest_installer_info() -> tuple[str, str] | None:
+  return _release_asset_info(INSTALLER_ASSET_NAME, INSTALLER_FALLBACK_URL)
+
+def _fetch_latest_extension_info() -> tuple[str, str] | None:
+  return _release_asset_info(EXTENSION_ASSET_NAME, EXTENSION_FALLBACK_URL)
+
 def _open_url(url: str):
   try:
     if url:
@@ -323,21 +449,7 @@ def _open_url(url: str):
     pass
 
 def _download_to_temp(url: str) -> str | None:
-  try:
-    dest = os.path.join(tempfile.gettempdir(), f"{INSTALLER_ASSET_NAME}")
-    req = urllib.request.Request(url, headers={"User-Agent": "MangaUpscalerHost"})
-    with urllib.request.urlopen(req, timeout=20) as resp:
-      if resp.status != 200:
-        return None
-      with open(dest, "wb") as f:
-        while True:
-          chunk = resp.read(1024 * 256)
-          if not chunk:
-            break
-          f.write(chunk)
-    return dest
-  except Exception:
-    return None
+  return _download_url_to_temp(url, INSTALLER_ASSET_NAME)
 
 def _download_url_to_temp(url: str, filename: str) -> str | None:
   try:
@@ -347,11 +459,8 @@ def _download_url_to_temp(url: str, filename: str) -> str | None:
       if resp.status != 200:
         return None
       with open(dest, "wb") as f:
-        while True:
-          chunk = resp.read(1024 * 256)
-          if not chunk:
-            break
-          f.write(chunk)
+        # The copy loop runs in C; 1 MiB blocks keep the syscall count down on the installer.
+        shutil.copyfileobj(resp, f, length=1024 * 1024)
     return dest
   except Exception:
     return None
@@ -388,8 +497,12 @@ def _find_extension_path_windows(extension_id: str) -> str | None:
           if not os.path.exists(p):
             continue
           try:
-            with open(p, "r", encoding="utf-8", errors="ignore") as f:
-              data = json.load(f) or {}
+            with open(p, "rb") as f:
+              raw = f.read()
+            # Preferences files run to megabytes; only parse the ones that mention this extension.
+            if ext_id.encode("ascii", "ignore") not in raw:
+              continue
+            data = json.loads(raw.decode("utf-8", "ignore")) or {}
             settings = (((data.get("extensions") or {}).get("settings")) or {})
             entry = settings.get(ext_id) or {}
             path = str((entry.get("path") or "")).strip()
@@ -411,27 +524,39 @@ def _apply_extension_update(zip_path: str, extension_id: str) -> tuple[bool, str
     return (False, "missing_zip")
 
   try:
-    tmp_dir = tempfile.mkdtemp(prefix="mu_ext_")
+    # Stream each member straight into place (tmp + replace per file) instead of extracting to a
+    # staging dir and copying everything a second time.
+    root = os.path.abspath(dest)
+    failed: list[str] = []
     with zipfile.ZipFile(zip_path, "r") as z:
-      z.extractall(tmp_dir)
-    for root, _dirs, files in os.walk(tmp_dir):
-      rel = os.path.relpath(root, tmp_dir)
-      out_dir = dest if rel == "." else os.path.join(dest, rel)
-      os.makedirs(out_dir, exist_ok=True)
-      for fn in files:
-        src = os.path.join(root, fn)
-        dst = os.path.join(out_dir, fn)
+      for info in z.infolist():
+        if info.is_dir():
+          continue
+        dst = os.path.abspath(os.path.join(root, info.filename))
+        # Same guard extractall applies: never write outside the extension folder.
+        if os.path.commonpath([root, dst]) != root:
+          continue
+        tmp = dst + ".tmp"
         try:
-          tmp = dst + ".tmp"
-          with open(src, "rb") as fsrc, open(tmp, "wb") as fdst:
-            fdst.write(fsrc.read())
+          os.makedirs(os.path.dirname(dst), exist_ok=True)
+          with z.open(info) as fsrc, open(tmp, "wb") as fdst:
+            shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
           os.replace(tmp, dst)
         except Exception:
+          # The browser can hold extension files open, which blocks the rename; overwrite in
+          # place instead.
           try:
-            import shutil
-            shutil.copy2(src, dst)
+            with z.open(info) as fsrc, open(dst, "wb") as fdst:
+              shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
           except Exception:
+            failed.append(info.filename)
+        finally:
+          try:
+            os.remove(tmp)
+          except OSError:
             pass
+    if failed:
+      return (False, "copy_failed: " + ", ".join(failed[:10]))
     return (True, dest)
   except Exception:
     return (False, "extract_copy_failed")
@@ -551,33 +676,120 @@ def _on_download_models(icon, item, ctl: HostController):
 
 
 def _on_quit(icon, item, ctl: HostController):
+  ctl.quitting = True
   ctl.stop()
   _remove_pid()
   icon.stop()
 
 
+def _follow_events(ctl: HostController, on_status) -> bool:
+  # Follow the host's /events stream, handing each pushed status to on_status until the stream
+  # ends (host stopped), the tray quits, or status_wake asks for a fresh poll. False if the
+  # stream couldn't be opened at all.
+  # Plain socket with a short timeout rather than http.client: a timed-out read leaves
+  # HTTPResponse unusable, and we need to wake up regularly to check quitting/status_wake.
+  opened = False
+  sock = None
+  try:
+    sock = socket.create_connection((HOST, PORT), timeout=2)
+    sock.sendall(f"GET /events HTTP/1.1\r\nHost: {HOST}:{PORT}\r\nAccept: text/event-stream\r\n\r\n".encode("ascii"))
+    sock.settimeout(EVENTS_WAKE_SEC)
+    buf = b""
+    last_rx = time.monotonic()
+    while not ctl.quitting:
+      if ctl.status_wake.is_set():
+        # Leave the wake flag for the caller, which polls right away.
+        break
+      try:
+        chunk = sock.recv(65536)
+      except socket.timeout:
+        if time.monotonic() - last_rx > EVENTS_READ_TIMEOUT:
+          break
+        continue
+      if not chunk:
+        break
+      last_rx = time.monotonic()
+      buf += chunk
+      if not opened:
+        head, sep, rest = buf.partition(b"\r\n\r\n")
+        if not sep:
+          continue
+        status = head.split(b"\r\n", 1)[0].split()
+        if len(status) < 2 or status[1] != b"200":
+          return False
+        opened = True
+        buf = rest
+      while b"\n" in buf:
+        line, buf = buf.split(b"\n", 1)
+        if line.startswith(b"data: "):
+          try:
+            on_status(json.loads(line[6:]))
+          except ValueError:
+            pass
+    return opened
+  except Exception:
+    return opened
+  finally:
+    if sock is not None:
+      try:
+        sock.close()
+      except Exception:
+        pass
+
+
 def _status_loop(icon, ctl: HostController, idle_icon: Image.Image, busy_icon: Image.Image):
   last_busy = None
-  while True:
-    st = _fetch_status()
+  last_state = None
+  interval = 0.7
+  events_ok = True
+
+  def show(st: dict | None) -> tuple[bool, bool]:
+    nonlocal last_busy, last_state
     running = bool(st and st.get("ok"))
     busy = bool(st and st.get("busy")) if running else False
-
-    if running and busy:
-      icon.title = "Manga Upscaler Host (enhancing)"
-    elif running:
-      icon.title = "Manga Upscaler Host (running)"
-    else:
-      icon.title = "Manga Upscaler Host (stopped)"
-
+    ctl.note_running(running)
+    if (running, busy) != last_state:
+      if running and busy:
+        icon.title = "Manga Upscaler Host (enhancing)"
+      elif running:
+        icon.title = "Manga Upscaler Host (running)"
+      else:
+        icon.title = "Manga Upscaler Host (stopped)"
+      last_state = (running, busy)
     if last_busy is None or busy != last_busy:
       try:
         icon.icon = busy_icon if busy else idle_icon
       except Exception:
         pass
       last_busy = busy
+    return running, busy
+
+  while not ctl.quitting:
+    prev_state = last_state
+    ctl.status_wake.clear()
+    state = show(_fetch_status())
+    if state[0] and events_ok:
+      # Host is up: let it push changes. Once the stream ends (or a refresh is requested), poll
+      # straight away to see why.
+      events_ok = _follow_events(ctl, show)
+      if events_ok:
+        interval = 0.7
+        continue
 
-    time.sleep(0.7 if running else 1.4)
+    # Poll quickly right after a change and back off while nothing happens, so an idle tray
+    # isn't waking up every ~second. Stopped hosts only come back via the menu (which wakes us)
+    # or the extension, so they can back off further.
+    if state != prev_state:
+      interval = 0.7 if state[0] else 1.4
+      # A restarted (possibly updated) host may support /events again.
+      events_ok = events_ok or not state[0]
+    elif time.monotonic() < ctl.fast_poll_until:
+      # Just started or stopped from the menu: the first polls usually still see the old state,
+      # so don't let them build up a backoff before the host has come up or gone down.
+      interval = 0.7
+    else:
+      interval = min(interval * 1.5, 3.0 if state[0] else 10.0)
+    ctl.status_wake.wait(interval)
 
 
 def _update_loop(icon: pystray.Icon, ctl: HostController):